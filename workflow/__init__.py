@@ -1,3 +1,4 @@
 
 from . import task_manager
 from . import chunktime
+from . import taskgraph
@@ -4,30 +4,173 @@ except:
     import pickle
 import argparse
 import tempfile
+import struct
+import base64
+import hashlib
+import zlib
+import sys
 import os
-from subprocess import call
 
 if 'TMPDIR' in os.environ:
     tmpdir = os.path.join(os.environ['TMPDIR'], '')
 else:
     tmpdir = os.path.join('.', '')
 
-if not os.path.exists(tmpdir):
-    call(['mkdir','-p',tmpdir])
+#-- manifest files: magic, pickled shared kwargs, one pickled delta per
+#-- entry, pickled list of entry offsets, offset of that list (8 bytes)
+MANIFEST_MAGIC = b'ARGPASS1'
 
+#-- inline arguments: compressed pickle in URL-safe base64 after a prefix;
+#-- larger payloads are written to a file instead
+INLINE_PREFIX = 'b64z:'
+INLINE_MAX = 32768
+
+#-- numpy arrays of at least SPILL_MIN bytes are written once to a
+#-- content-hashed .npy file in tmpdir and passed by reference
+SPILL_MIN = 65536
+
+#------------------------------------------------------------
+#-- class
+#------------------------------------------------------------
+
+class _NpyRef(object):
+    '''reference to an array in a .npy file'''
+    def __init__(self,path):
+        self.path = path
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _map_items(func,obj):
+    '''return a copy of a dict, list, tuple or namedtuple with func
+    applied to its items; other objects, including subclasses of these
+    types, are returned as-is'''
+    if type(obj) is dict:
+        return dict((k,func(v)) for k,v in obj.items())
+    elif type(obj) in (list,tuple):
+        return type(obj)(func(v) for v in obj)
+    elif isinstance(obj,tuple) and hasattr(obj,'_make') and hasattr(obj,'_fields'):
+        return obj._make(func(v) for v in obj)
+    return obj
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _spill_arrays(obj):
+    '''return obj with large numpy arrays in (nested) dicts, lists and
+    tuples replaced by references to .npy files'''
+    if 'numpy' not in sys.modules:
+        return obj
+    np = sys.modules['numpy']
+
+    if (type(obj) is np.ndarray and obj.nbytes >= SPILL_MIN
+          and not obj.dtype.hasobject):
+        obj = np.ascontiguousarray(obj)
+        sha = hashlib.sha1(obj.dtype.str.encode('ascii')+str(obj.shape).encode('ascii'))
+        sha.update(obj.data)
+        path = os.path.join(os.path.abspath(tmpdir),sha.hexdigest()+'.npy')
+        if not os.path.exists(path):
+            if not os.path.exists(tmpdir):
+                os.makedirs(tmpdir)
+            (fid,tmpfile) = tempfile.mkstemp(suffix='.npy',dir=tmpdir)
+            with os.fdopen(fid,'wb') as fid:
+                np.save(fid,obj)
+            os.rename(tmpfile,path)
+        return _NpyRef(path)
+    return _map_items(_spill_arrays,obj)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _load_arrays(obj):
+    '''return obj with references to .npy files replaced by read-only,
+    memory-mapped arrays'''
+    if isinstance(obj,_NpyRef):
+        import numpy as np
+        return np.load(obj.path,mmap_mode='r')
+    return _map_items(_load_arrays,obj)
 
 #------------------------------------------------------------
 #-- function
 #------------------------------------------------------------
 
 def picklepass(kwargs,asfile=False):
-    if asfile:
-        (fid,tmpfile) = tempfile.mkstemp(suffix='.picklepass',dir=tmpdir)
-        with open(tmpfile,'wb') as fid:
-            pickle.dump(kwargs,fid)
-        return tmpfile
-    else:
-        return '"{0}"'.format(pickle.dumps(kwargs))
+    '''encode kwargs for the command line of a script using pickleparse
+
+    By default, return a shell-safe inline string (compressed pickle in
+    base64); if that exceeds INLINE_MAX characters, or if asfile, write
+    kwargs to a file and return its name. pickleparse detects which.
+    Large numpy arrays are passed as references to .npy files (see
+    SPILL_MIN).
+    '''
+    kwargs = _spill_arrays(kwargs)
+    if not asfile:
+        payload = pickle.dumps(kwargs,pickle.HIGHEST_PROTOCOL)
+        inline = INLINE_PREFIX+base64.urlsafe_b64encode(zlib.compress(payload)).decode('ascii')
+        if len(inline) <= INLINE_MAX:
+            return inline
+
+    if not os.path.exists(tmpdir):
+        os.makedirs(tmpdir)
+    (fid,tmpfile) = tempfile.mkstemp(suffix='.picklepass',dir=tmpdir)
+    with os.fdopen(fid,'wb') as fid:
+        pickle.dump(kwargs,fid)
+    return tmpfile
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def picklepass_manifest(shared,deltas):
+    '''write one file holding the arguments of many tasks
+
+    Parameters
+    ----------
+
+    shared : dict
+      keyword arguments common to all tasks
+    deltas : list
+      for each task, a dictionary of keyword arguments updating `shared`
+
+    Returns: file name; task i reads its arguments with
+    `script -f <file> -i <i>`
+    '''
+    shared = _spill_arrays(shared)
+    deltas = _spill_arrays(deltas)
+    if not os.path.exists(tmpdir):
+        os.makedirs(tmpdir)
+    (fid,tmpfile) = tempfile.mkstemp(suffix='.manifest',dir=tmpdir)
+    with os.fdopen(fid,'wb') as fid:
+        fid.write(MANIFEST_MAGIC)
+        pickle.dump(shared,fid,pickle.HIGHEST_PROTOCOL)
+        offsets = []
+        for delta in deltas:
+            offsets.append(fid.tell())
+            pickle.dump(delta,fid,pickle.HIGHEST_PROTOCOL)
+        offset_index = fid.tell()
+        pickle.dump(offsets,fid,pickle.HIGHEST_PROTOCOL)
+        fid.write(struct.pack('>Q',offset_index))
+    return tmpfile
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def read_manifest(path,index):
+    '''return the keyword arguments of entry `index` of a manifest file'''
+    with open(path,'rb') as fid:
+        if fid.read(len(MANIFEST_MAGIC)) != MANIFEST_MAGIC:
+            raise ValueError('Not a manifest file: %s'%path)
+        control = pickle.load(fid)
+        fid.seek(-8,os.SEEK_END)
+        fid.seek(struct.unpack('>Q',fid.read(8))[0])
+        offsets = pickle.load(fid)
+        fid.seek(offsets[index])
+        control.update(pickle.load(fid))
+    return control
 
 #------------------------------------------------------------
 #-- function
@@ -53,18 +196,38 @@ def pickleparse(default={},description='',required_parameters=[]):
                    dest='kwargs_as_file',
                    action='store_true',
                    default=False,
-                   help='Interpret input as a file name')
+                   help='Interpret input as a file name (default: detected)')
+
+    p.add_argument('-i',
+                   dest='index',
+                   type=int,
+                   default=None,
+                   help='Select entry from a list of inputs (e.g., job array task)')
 
     args = p.parse_args()
     print(args.kwargs)
-    if not args.kwargs_as_file:
+    is_manifest = False
+    if args.kwargs.startswith(INLINE_PREFIX):
+        payload = base64.urlsafe_b64decode(args.kwargs[len(INLINE_PREFIX):].encode('ascii'))
+        control_in = pickle.loads(zlib.decompress(payload))
+    elif not args.kwargs_as_file and not os.path.isfile(args.kwargs):
         control_in = pickle.loads(args.kwargs)
     else:
         with open(args.kwargs,'rb') as fp:
-            control_in = pickle.load(fp)
+            is_manifest = fp.read(len(MANIFEST_MAGIC)) == MANIFEST_MAGIC
+            if not is_manifest:
+                fp.seek(0)
+                control_in = pickle.load(fp)
+        if is_manifest:
+            if args.index is None:
+                raise ValueError('Manifest file requires an index (-i)')
+            control_in = read_manifest(args.kwargs,args.index)
+
+    if args.index is not None and not is_manifest:
+        control_in = control_in[args.index]
 
     control = default
-    control.update(control_in)
+    control.update(_load_arrays(control_in))
 
     #-- consider required arguments:
     missing_req = False
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+'''
+run the commands of a task bundle inside one batch job
+
+usage: python -m workflow.bundle manifest.json
+
+The manifest is written by task_manager when bundling is active (see
+task_manager.bundle_start). It holds the list of commands, the number of
+workers and, for each command, the path of the completion record to
+write. Commands run concurrently on a pool of `workers` threads; each
+record holds the exit code, start/end time, host and peak RSS of the
+command, in the same format as the records written by task_manager's
+batch scripts. The job exits non-zero if any command failed.
+'''
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import socket
+from subprocess import Popen
+from concurrent.futures import ThreadPoolExecutor
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _write_record(path,record):
+    '''write a completion record atomically'''
+    with open(path+'.tmp','w') as fid:
+        for key in ['exit_code','start','end','host','maxrss']:
+            fid.write('%s=%s\n'%(key,record[key]))
+    os.rename(path+'.tmp',path)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _run_one(command,record_file):
+    '''run one command, write its record and return its exit code'''
+
+    start = int(time.time())
+    p = Popen(['/bin/bash','-c',command])
+    pid,status,rusage = os.wait4(p.pid,0)
+
+    if os.WIFEXITED(status):
+        exit_code = os.WEXITSTATUS(status)
+    else:
+        exit_code = 128 + os.WTERMSIG(status)
+
+    _write_record(record_file,{'exit_code': exit_code,
+                               'start': start,
+                               'end': int(time.time()),
+                               'host': socket.gethostname(),
+                               'maxrss': rusage.ru_maxrss*1024})
+    return exit_code
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def run(manifest_file):
+    '''run all commands in a bundle manifest; return True on success'''
+
+    with open(manifest_file) as fid:
+        manifest = json.load(fid)
+
+    commands = manifest['commands']
+    records = manifest['records']
+
+    with ThreadPoolExecutor(max_workers=manifest['workers']) as pool:
+        exit_codes = list(pool.map(_run_one,commands,records))
+
+    for command,exit_code in zip(commands,exit_codes):
+        print('%3d: %s'%(exit_code,command))
+
+    return all(exit_code == 0 for exit_code in exit_codes)
+
+#------------------------------------------------------------
+#-- main
+#------------------------------------------------------------
+
+if __name__ == '__main__':
+    ok = run(sys.argv[1])
+    sys.exit(0 if ok else 1)
@@ -1,11 +1,37 @@
 import os
-import numpy as np
-import xarray as xr
+import re
+import sys
 import tempfile
-import copy
 
 from . import task_manager as tm
-from .argpass import picklepass
+from . import ncheader
+from .argpass import picklepass_manifest
+
+#------------------------------------------------------------
+#-- settings
+#------------------------------------------------------------
+
+#-- memory model for chunk_size='auto': a job on n time levels needs
+#-- AUTO_MEMORY_FACTOR * n * (bytes per time level) + AUTO_MEMORY_BASE
+AUTO_MEMORY_FACTOR = 3.
+AUTO_MEMORY_BASE = '1GB'
+
+#-- memory per job for chunk_size='auto' unless given by target_memory or
+#-- the memory in submit_kwargs_i
+AUTO_TARGET_MEMORY = '30GB'
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _write_filelist(files):
+    '''write a list of files, one per line, to a temporary file'''
+    (fid,tmpfile) = tempfile.mkstemp('.filelist',dir=tm.TMPDIR)
+    os.close(fid)
+    with open(tmpfile,'w') as fid:
+        for f in files:
+            fid.write('%s\n'%f)
+    return tmpfile
 
 #------------------------------------------------------------
 #-- function
@@ -22,20 +48,40 @@ def ncrcat(input,output,kwargs={}):
     output : str
       output file
     kwargs : dict, optional
-      dictionary of keyword arguments to task_manager.submit
+      dictionary of keyword arguments to task_manager.submit; in addition,
+        engine : "ncrcat" (default) or "stream" to use workflow.nccat,
+                 which copies records in slabs of bounded size
+        buffer : slab size for engine="stream" (default "1GB")
+        read_ahead : read the next file ahead for engine="stream"
+                     (default True)
     '''
 
-    kwargs['modules'] = ['nco']
-    kwargs['module_purge'] = False
-    if 'memory' not in kwargs:
-        kwargs['memory'] = '100GB'
+    kwargs = dict(kwargs)
+    engine = kwargs.pop('engine','ncrcat')
+    buffer = kwargs.pop('buffer','1GB')
+    read_ahead = kwargs.pop('read_ahead',True)
 
-    (fid,tmpfile) = tempfile.mkstemp('.filelist')
-    with open(tmpfile,'w') as fid:
-        for f in input:
-            fid.write('%s\n'%f)
+    tmpfile = _write_filelist(input)
+
+    if engine == 'stream':
+        if 'memory' not in kwargs:
+            kwargs['memory'] = tm.format_memory(2*tm.parse_memory(buffer)+2**30)
+        python = sys.executable if tm.Q_SYSTEM is None else 'python'
+        command = [python,'-m','workflow.nccat','-b',buffer,'-l',tmpfile,'-o',output]
+        if not read_ahead:
+            command.append('--no-read-ahead')
+        jid = tm.submit(command, **kwargs)
+
+    elif engine == 'ncrcat':
+        kwargs['modules'] = ['nco']
+        kwargs['module_purge'] = False
+        if 'memory' not in kwargs:
+            kwargs['memory'] = '100GB'
+        jid = tm.submit(['cat',tmpfile,'|','ncrcat','-o',output], **kwargs)
+
+    else:
+        raise ValueError('Unknown concatenation engine: %s'%engine)
 
-    jid = tm.submit(['cat',tmpfile,'|','ncrcat','-o',output], **kwargs)
     return jid
 
 #------------------------------------------------------------
@@ -70,6 +116,286 @@ def gen_time_chunks(start,stop,chunk_size):
 #-- function
 #------------------------------------------------------------
 
+def read_time(file_in,dim='time'):
+    '''read and decode the time coordinate of a file or list of files;
+    each file is decoded with its own units, the calendars must match
+
+    Returns: array of datetime64 (standard calendars) or cftime dates
+    '''
+    import numpy as np
+    from xarray.coding.times import decode_cf_datetime
+
+    if not isinstance(file_in,list):
+        file_in = [file_in]
+
+    #-- calendar names with the same meaning
+    calendar_alias = {'gregorian': 'standard', 'noleap': '365_day',
+                      'all_leap': '366_day'}
+
+    values = []
+    calendar_in = None
+    for path in file_in:
+        try:
+            import netCDF4
+        except ImportError:
+            import xarray as xr
+            with xr.open_dataset(path,decode_times=False,decode_coords=False) as ds:
+                time = ds[dim].values
+                attrs = ds[dim].attrs
+        else:
+            with netCDF4.Dataset(path) as nc:
+                nc.set_auto_maskandscale(False)
+                time = nc.variables[dim][:]
+                attrs = dict((k,nc.variables[dim].getncattr(k))
+                             for k in nc.variables[dim].ncattrs())
+
+        calendar = attrs.get('calendar','standard')
+        if calendar_in is None:
+            calendar_in = calendar
+        elif (calendar_alias.get(calendar.lower(),calendar.lower()) !=
+              calendar_alias.get(calendar_in.lower(),calendar_in.lower())):
+            raise ValueError('%s: calendar "%s" differs from "%s" of %s'%(
+                path,calendar,calendar_in,file_in[0]))
+
+        values.append(decode_cf_datetime(time,attrs['units'],calendar))
+
+    return np.concatenate(values)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def gen_calendar_chunks(time,freq,start=0):
+    '''generate a list of index pairs aligned with calendar periods
+
+    Parameters
+    ----------
+
+    time : array
+      decoded time coordinate (from `read_time`)
+    freq : str
+      "month", "year", or a number of either (e.g., "3month", "10year")
+    start : int, optional
+      index of time[0] in the input
+
+    Returns: time_ndx, labels : index pairs and a label for each chunk
+    ("YYYY-MM", "YYYY", or "YYYY-YYYY" for several years)
+    '''
+    import numpy as np
+
+    match = re.match(r'^\s*(\d*)\s*(month|year)s?\s*$',freq)
+    if match is None:
+        raise ValueError('Unknown chunk frequency: %s'%freq)
+    n = int(match.group(1) or 1)
+    unit = match.group(2)
+
+    if np.issubdtype(time.dtype,np.datetime64):
+        year = time.astype('M8[Y]').astype(int) + 1970
+        month = time.astype('M8[M]').astype(int)%12 + 1
+    else:
+        year = np.array([t.year for t in time])
+        month = np.array([t.month for t in time])
+
+    #-- period of each time level; chunks start where the period changes
+    if unit == 'month':
+        period = year*12 + month - 1
+    else:
+        period = year
+    period = (period - period[0])//n
+
+    bounds = np.concatenate([[0],np.flatnonzero(np.diff(period))+1,[len(time)]])
+    time_ndx = [(start+int(i0),start+int(i1)) for i0,i1 in zip(bounds[:-1],bounds[1:])]
+
+    labels = []
+    for i0,i1 in zip(bounds[:-1],bounds[1:]):
+        if unit == 'month' and n == 1:
+            labels.append('%04d-%02d'%(year[i0],month[i0]))
+        elif unit == 'month':
+            labels.append('%04d-%02d_%04d-%02d'%(year[i0],month[i0],year[i1-1],month[i1-1]))
+        elif n == 1:
+            labels.append('%04d'%year[i0])
+        else:
+            labels.append('%04d-%04d'%(year[i0],year[i1-1]))
+
+    return time_ndx,labels
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def auto_chunk_size(record_bytes,time_level_count,target_memory='30GB',
+                    target_njob=None):
+    '''choose a chunk size and memory request
+
+    Parameters
+    ----------
+
+    record_bytes : int
+      bytes per time level of the input
+    time_level_count : int
+      number of time levels to process
+    target_memory : str, optional
+      maximum memory per job
+    target_njob : int, optional
+      preferred number of jobs; chunks are made no larger than needed to
+      reach it, within target_memory
+
+    Returns: chunk_size, memory
+    '''
+    base = tm.parse_memory(AUTO_MEMORY_BASE)
+    per_level = AUTO_MEMORY_FACTOR*max(record_bytes,1)
+
+    chunk_size = int((tm.parse_memory(target_memory) - base)//per_level)
+    if target_njob:
+        chunk_size = min(chunk_size,-(-time_level_count//target_njob))
+    chunk_size = max(min(chunk_size,time_level_count),1)
+
+    memory = tm.format_memory(int(base + chunk_size*per_level))
+    return chunk_size,memory
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def time_index(file_in):
+    '''return the global time position at which each file starts
+
+    Parameters
+    ----------
+
+    file_in : list
+      list of files, in time order
+
+    Returns: offsets : array of length len(file_in)+1; file i holds global
+    time levels offsets[i] to offsets[i+1]
+    '''
+    import numpy as np
+    return np.cumsum([0]+[ncheader.time_length(f) for f in file_in])
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def chunk_files(offsets,time_chunks):
+    '''map time chunks onto the files that hold them
+
+    Parameters
+    ----------
+
+    offsets : array
+      global time offsets of the files, from `time_index`
+    time_chunks : list
+      index pairs from `gen_time_chunks`
+
+    Returns: list of (i0, i1, start, stop): each chunk spans files i0 to
+    i1-1 and time levels start to stop of their concatenation
+    '''
+    import numpy as np
+    tnx = np.array(time_chunks).reshape(-1,2)
+    i0 = np.searchsorted(offsets,tnx[:,0],side='right') - 1
+    i1 = np.searchsorted(offsets,tnx[:,1],side='left')
+    i1 = np.maximum(i1,i0+1)
+    base = offsets[i0]
+    return [(int(a),int(b),int(c),int(d))
+            for a,b,c,d in zip(i0,i1,tnx[:,0]-base,tnx[:,1]-base)]
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def cat_tree(input,output,depjob,group,kwargs={}):
+    '''Concatenate files in a tree of ncrcat jobs
+
+    Parameters
+    ----------
+
+    input : list
+      list of files to concatenate
+    output : str
+      output file
+    depjob : list
+      job IDs that each input file depends on (None if the file exists)
+    group : int
+      number of files merged by each job; groups are merged as soon as
+      their inputs are done, level by level, until one job writes output
+    kwargs : dict, optional
+      dictionary of keyword arguments to task_manager.submit for ncrcat
+
+    Returns: jid, partial_files : job ID of the final merge and list of
+    intermediate files written
+    '''
+    if group < 2:
+        raise ValueError('cat_tree group size must be at least 2')
+
+    level = 0
+    partial_files = []
+    nodes = [(f,[j] if j is not None else []) for f,j in zip(input,depjob)]
+    while len(nodes) > group:
+        nodes_next = []
+        for i in range(0,len(nodes),group):
+            members = nodes[i:i+group]
+            if len(members) == 1:
+                nodes_next.extend(members)
+                continue
+            file_partial = output+'.cat.%d.%d'%(level,i//group)
+            jid = ncrcat([f for f,_ in members],file_partial,
+                         dict(kwargs,depjob=_unique([j for _,d in members for j in d])))
+            nodes_next.append((file_partial,[jid]))
+            partial_files.append(file_partial)
+        nodes = nodes_next
+        level += 1
+
+    jid = ncrcat([f for f,_ in nodes],output,
+                 dict(kwargs,depjob=_unique([j for _,d in nodes for j in d])))
+    return jid,partial_files
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _unique(seq):
+    out = []
+    for item in seq:
+        if item not in out:
+            out.append(item)
+    return out
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _list_intermediates(file_out):
+    '''return the size of intermediate files of file_out by name, from
+    one listing of the output directory'''
+    dirname = os.path.dirname(file_out) or '.'
+    prefix = os.path.basename(file_out)+'.tnx.'
+    if not os.path.isdir(dirname):
+        return {}
+    return dict((entry.name,entry.stat().st_size)
+                for entry in os.scandir(dirname) if entry.name.startswith(prefix))
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _valid_intermediate(path,ntime,existing,marker):
+    '''check that an intermediate file exists, is not empty, has a
+    readable header with ntime time levels and, if marker, that its
+    completion marker exists'''
+    name = os.path.basename(path)
+    if existing.get(name,0) <= 0:
+        return False
+    if marker and name+'.done' not in existing:
+        return False
+    try:
+        return ncheader.time_length(path) == ntime
+    except Exception:
+        return False
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
 def apply(script,
           kwargs,
           chunk_size,
@@ -78,7 +404,12 @@ def apply(script,
           clobber=False,
           cleanup=True,
           submit_kwargs_i={'memory':'30GB'},
-          submit_kwargs_cat={}):
+          submit_kwargs_cat={},
+          array=False,
+          cat_group=None,
+          target_memory=None,
+          target_njob=None,
+          marker=False):
     '''run script on time segments within a file and concatenate results
 
     Parameters
@@ -87,21 +418,45 @@ def apply(script,
     script : str
       string for the executable to run
     kwargs : dict
-      dictionary of keyword arguments; must contain "file_in" and "file_out"
-    chunk_size : int
-      number of time levels in time chunks
+      dictionary of keyword arguments; must contain "file_in" and "file_out";
+      if "file_in" is a list of files in time order, time indices are global
+      across the list and each chunk receives only the files it spans
+    chunk_size : int, 'auto' or calendar period
+      number of time levels in time chunks; 'auto' chooses the chunk size
+      and the memory request from the bytes per time level of the input
+      (see `auto_chunk_size`); "month", "year" or "Nyear" (e.g., "5year")
+      align chunks with calendar periods of the time coordinate and pass
+      the period label to the script as kwargs["time_label"]
     start : int, optional
       starting time index, default = 0
     stop : int, optional
       final time index, default = None (i.e., the last index)
     clobber : logical, optional
-      overwrite "file_out"
+      overwrite "file_out" and intermediate files; otherwise intermediate
+      files from a previous run are reused if valid: not empty, with a
+      readable header and the expected number of time levels
     cleanup : logical, optional
       remove intermediate files after completion
     submit_kwargs : dict, optional
       dictionary of keyword arguments to task_manager.submit
     submit_kwargs_cat : dict, optional
-      dictionary of keyword arguments to task_manager.submit for ncrcat
+      dictionary of keyword arguments to task_manager.submit for ncrcat;
+      {'engine': 'stream'} concatenates with workflow.nccat instead
+    array : logical, optional
+      submit the time chunks as job arrays of at most tm.MAX_ARRAY_SIZE
+      tasks; each task selects its chunk from the array index
+    cat_group : int, optional
+      concatenate in a tree of jobs merging cat_group files each, starting
+      as soon as the chunks in a group are done (see `cat_tree`); by
+      default, one job concatenates all chunks after they finish
+    target_memory : str, optional
+      memory per job for chunk_size='auto'; default is the memory in
+      submit_kwargs_i if given with a unit, else AUTO_TARGET_MEMORY
+    target_njob : int, optional
+      preferred number of chunks for chunk_size='auto'
+    marker : logical, optional
+      write a marker file ("<intermediate>.done") when a chunk job
+      succeeds, and reuse only intermediate files that have one
 
     Returns: jid_list : list of job ID numbers
     '''
@@ -113,50 +468,146 @@ def apply(script,
         raise ValueError('Missing "file_out" in kwargs')
 
     jid_list = []
-    file_out = copy.copy(kwargs['file_out'])
+    file_out = kwargs['file_out']
     if os.path.exists(file_out) and not clobber:
         return jid_list
 
-    #-- define fuction to operate on single time chunk
-    def _apply_one_chunk(tnx):
+    #-- get stopping index; for multiple files, index the time levels of
+    #-- all files and find the files spanned by each chunk
+    file_in = kwargs['file_in']
+    if isinstance(file_in,list):
+        offsets = time_index(file_in)
+        if stop is None:
+            stop = int(offsets[-1])
+    elif stop is None:
+        stop = ncheader.time_length(file_in)
+
+    #-- size chunks and memory request from the input variables
+    if chunk_size == 'auto':
+        file_in_0 = file_in[0] if isinstance(file_in,list) else file_in
+        if target_memory is None:
+            #-- the job's memory request if it is an amount with a unit
+            #-- (not "auto", and not a bare number the batch system
+            #-- reads in its own unit)
+            target_memory = submit_kwargs_i.get('memory')
+            if not (isinstance(target_memory,str) and
+                    re.match(r'^\s*[0-9.]+\s*[KMGT]B?\s*$',target_memory.upper())):
+                target_memory = AUTO_TARGET_MEMORY
+        else:
+            try:
+                tm.parse_memory(target_memory)
+            except (ValueError,AttributeError):
+                raise ValueError('Cannot parse target_memory: %s'%target_memory)
+        chunk_size,memory = auto_chunk_size(ncheader.record_bytes(file_in_0),
+                                            stop-start,target_memory,target_njob)
+        submit_kwargs_i = dict(submit_kwargs_i,memory=memory)
+
+    if isinstance(chunk_size,str) and chunk_size != 'auto':
+        time = read_time(file_in)[start:stop]
+        time_chunks,time_labels = gen_calendar_chunks(time,chunk_size,start)
+    else:
+        time_chunks = gen_time_chunks(start,stop,chunk_size)
+        time_labels = [None]*len(time_chunks)
+
+    if isinstance(file_in,list):
+        chunk_file_list = chunk_files(offsets,time_chunks)
+    else:
+        chunk_file_list = [None]*len(time_chunks)
+
+    #-- find chunks to compute, reusing valid intermediate files of a
+    #-- previous run; each chunk updates only isel, file_out (and file_in,
+    #-- time_label) of the shared kwargs
+    existing = {} if clobber else _list_intermediates(file_out)
+    file_cat = []
+    chunk_jid = {}
+    deltas = []
+    markers = []
+    for tnx,files,label in zip(time_chunks,chunk_file_list,time_labels):
 
         #-- intermediate output file
         file_out_i = file_out+'.tnx.%d-%d'%(tnx)
-
-        if os.path.exists(file_out_i) and not clobber:
-            return file_out_i
-
-        #-- update input arguments
-        kwargs.update({'isel': {'time':slice(tnx[0],tnx[1])},
-                       'file_out': file_out_i})
-
-        #-- submit
-        jid = tm.submit([script, '-f', picklepass(kwargs, asfile=True)],**submit_kwargs_i)
-        jid_list.append(jid)
-
-        return file_out_i
-
-
-    #-- get stopping index
-    file_in_0 = kwargs['file_in']
-    if isinstance(file_in_0,list):
-        file_in_0 = file_in_0[0]
-
-    if stop is None:
-        stop = len(xr.open_dataset(file_in_0,
-                                   decode_times=False,
-                                   decode_coords=False).time)
-    time_chunks = gen_time_chunks(start,stop,chunk_size)
-
-    #-- operate on each chunk
-    file_cat = [_apply_one_chunk(tnx) for tnx in time_chunks]
+        marker_i = file_out_i+'.done'
+        file_cat.append(file_out_i)
+
+        if _valid_intermediate(file_out_i,tnx[1]-tnx[0],existing,marker):
+            chunk_jid[file_out_i] = None
+            continue
+
+        if os.path.basename(marker_i) in existing:
+            os.remove(marker_i)
+
+        if files is None:
+            delta = {'isel': {'time':slice(tnx[0],tnx[1])},
+                     'file_out': file_out_i}
+        else:
+            i0,i1,t0,t1 = files
+            delta = {'file_in': file_in[i0:i1],
+                     'isel': {'time':slice(t0,t1)},
+                     'file_out': file_out_i}
+        if label is not None:
+            delta['time_label'] = label
+
+        deltas.append(delta)
+        markers.append(marker_i)
+
+    #-- one manifest holds the arguments of all chunks
+    manifest = None
+    if deltas:
+        manifest = picklepass_manifest(kwargs,deltas)
+
+    #-- input size of the largest chunk, for the usage history of the
+    #-- script (see task_manager memory='auto')
+    if deltas and 'input_size' not in submit_kwargs_i:
+        file_in_0 = file_in[0] if isinstance(file_in,list) else file_in
+        ntime = max(t1-t0 for t0,t1 in time_chunks)
+        submit_kwargs_i = dict(submit_kwargs_i,
+                               input_size=ntime*ncheader.record_bytes(file_in_0))
+
+    #-- submit job arrays with one task per chunk, at most
+    #-- tm.MAX_ARRAY_SIZE tasks each; tasks of later arrays add the
+    #-- offset of their first chunk to the array index
+    if deltas and array:
+        marker_list = _write_filelist(markers) if marker else None
+        for i0 in range(0,len(deltas),tm.MAX_ARRAY_SIZE):
+            i1 = min(i0+tm.MAX_ARRAY_SIZE,len(deltas))
+            index = '${%s}'%tm.ARRAY_INDEX_VAR
+            if i0:
+                index = '$((%s+%d))'%(index,i0)
+            command = [script, '-f', manifest, '-i', index]
+            if marker:
+                command += ['&&','touch','"$(sed -n $((%s+1))p %s)"'%(
+                    index,marker_list)]
+            jid = tm.submit(command,
+                            array=i1-i0,
+                            **submit_kwargs_i)
+            jid_list.append(jid)
+            for delta in deltas[i0:i1]:
+                chunk_jid[delta['file_out']] = jid
+
+    #-- or one job per chunk
+    elif deltas:
+        for i,delta in enumerate(deltas):
+            command = [script, '-f', manifest, '-i', str(i)]
+            if marker:
+                command += ['&&','touch',markers[i]]
+            jid = tm.submit(command,**submit_kwargs_i)
+            jid_list.append(jid)
+            chunk_jid[delta['file_out']] = jid
 
     #-- concatenate files
-    submit_kwargs_cat.update({'depjob':jid_list})
-    jid = ncrcat(file_cat,file_out,submit_kwargs_cat)
+    partial_files = []
+    if cat_group and len(file_cat) > cat_group:
+        jid,partial_files = cat_tree(file_cat,file_out,
+                                     [chunk_jid[f] for f in file_cat],
+                                     cat_group,submit_kwargs_cat)
+    else:
+        jid = ncrcat(file_cat,file_out,dict(submit_kwargs_cat,depjob=jid_list))
 
     #-- cleanup
     if cleanup:
-        tm.submit(['rm','-f',' '.join(file_cat)],depjob=jid)
+        markers = [f+'.done' for f in file_cat] if marker else []
+        manifests = [manifest] if manifest is not None else []
+        tmpfile = _write_filelist(file_cat+partial_files+markers+manifests)
+        tm.submit(['xargs','rm','-f','<',tmpfile,';','rm','-f',tmpfile],depjob=jid)
 
     return jid_list
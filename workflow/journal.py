@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+#------------------------------------------------------------
+#-- settings
+#------------------------------------------------------------
+
+#-- submit arguments that do not change what a task computes;
+#-- these are left out of the task key
+_key_exclude = ['depjob','memory','time_limit']
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def task_key(command,kwargs):
+    '''return a hash identifying a task by its command and submit arguments
+
+    Parameters
+    ----------
+
+    command : list
+      command passed to task_manager.submit
+    kwargs : dict
+      keyword arguments passed to task_manager.submit
+    '''
+    kwargs = dict((k,v) for k,v in kwargs.items() if k not in _key_exclude)
+    task = json.dumps([command,kwargs],sort_keys=True,default=str)
+    return hashlib.sha1(task.encode('UTF-8')).hexdigest()
+
+#------------------------------------------------------------
+#-- class
+#------------------------------------------------------------
+
+class Journal(object):
+    '''transactional on-disk record of submitted jobs
+
+    Each task is stored under `task_key(command,kwargs)` with its job ID,
+    state, dependencies and timings, so that a restarted driver can skip
+    completed tasks and reattach to jobs that are still queued.
+
+    Parameters
+    ----------
+
+    path : str
+      SQLite database file; created if it does not exist
+    '''
+
+    def __init__(self,path):
+        self.path = path
+        self.conn = sqlite3.connect(path,timeout=60.)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                                   key TEXT PRIMARY KEY,
+                                   jid TEXT,
+                                   command TEXT,
+                                   kwargs TEXT,
+                                   depjob TEXT,
+                                   state TEXT,
+                                   record TEXT,
+                                   ntask INTEGER,
+                                   submit_time REAL,
+                                   end_time REAL)''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS jobs_jid ON jobs (jid)')
+
+    def lookup(self,key):
+        '''return the entry for a task key as a dictionary, or None'''
+        row = self.conn.execute('SELECT * FROM jobs WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            return None
+        return dict(row)
+
+    def active(self,states):
+        '''return entries whose state is in the list `states`'''
+        rows = self.conn.execute(
+            'SELECT * FROM jobs WHERE state IN (%s)'%','.join('?'*len(states)),
+            states).fetchall()
+        return [dict(row) for row in rows]
+
+    def add(self,key,jid,command,kwargs,state,depjob=None,
+            record=None,ntask=None):
+        '''record a submission, replacing any previous entry for the task'''
+        if isinstance(depjob,str):
+            depjob = [depjob]
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?)',
+                (key,jid,json.dumps(command,default=str),
+                 json.dumps(kwargs,sort_keys=True,default=str),
+                 json.dumps(depjob or []),state,record,ntask,time.time(),None))
+
+    def update(self,states,final_states=[]):
+        '''update the state of jobs in one transaction
+
+        Parameters
+        ----------
+
+        states : dict
+          new state by task key; job IDs are not unique across runs
+          (e.g., local jobs)
+        final_states : list, optional
+          states for which the end time is recorded
+        '''
+        if not states:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE jobs SET state = ?, end_time = ? WHERE key = ?',
+                [(state,now if state in final_states else None,key)
+                 for key,state in states.items()])
+
+    def close(self):
+        self.conn.close()
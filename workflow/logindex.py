@@ -0,0 +1,56 @@
+import time
+import sqlite3
+
+#------------------------------------------------------------
+#-- class
+#------------------------------------------------------------
+
+class LogIndex(object):
+    '''on-disk index of job run scripts and logs by job ID
+
+    Parameters
+    ----------
+
+    path : str
+      SQLite database file; created if it does not exist
+    '''
+
+    def __init__(self,path):
+        self.path = path
+        self.conn = sqlite3.connect(path,timeout=60.)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS logs (
+                                   jid TEXT PRIMARY KEY,
+                                   script TEXT,
+                                   log TEXT,
+                                   submit_time REAL,
+                                   command TEXT)''')
+
+    def add(self,jid,script,log,command):
+        '''record a submitted job; for job arrays, "%a" in log stands for
+        the array index'''
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO logs VALUES (?,?,?,?,?)',
+                              (jid,script,log,time.time(),command))
+
+    def lookup(self,jid):
+        '''return the entry for a job ID as a dictionary, or None; array
+        tasks may be given as "<jid>_<index>"'''
+        index = None
+        row = self.conn.execute('SELECT * FROM logs WHERE jid = ?',
+                                (jid,)).fetchone()
+        if row is None and '_' in jid:
+            jid,index = jid.rsplit('_',1)
+            row = self.conn.execute('SELECT * FROM logs WHERE jid = ?',
+                                    (jid,)).fetchone()
+        if row is None:
+            return None
+
+        entry = dict(row)
+        if entry['log'] is not None and '%a' in entry['log']:
+            entry['log'] = entry['log'].replace('%a',index or '0')
+        return entry
+
+    def close(self):
+        self.conn.close()
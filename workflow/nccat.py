@@ -0,0 +1,199 @@
+#! /usr/bin/env python
+'''
+concatenate netCDF files along the time dimension with bounded memory
+
+usage: python -m workflow.nccat [-b buffer] [--no-read-ahead] -o output
+                                (-l file_list | input ...)
+
+Variables along time are copied in slabs of at most `buffer` bytes (e.g.,
+"1GB"); other variables are copied from the first file. The time
+coordinate and its bounds are converted to the units of the first file,
+as ncrcat does. While a file is copied, the kernel is asked to read the
+next one ahead (posix_fadvise WILLNEED). The output is written to
+"<output>.tmp" and renamed once complete.
+'''
+from __future__ import print_function
+
+import os
+import sys
+import argparse
+
+from .task_manager import parse_memory
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _read_ahead(path):
+    '''start asynchronous read-ahead of a file, where supported'''
+    if not hasattr(os,'posix_fadvise'):
+        return
+    fd = os.open(path,os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd,0,0,os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _define(src,dst,dim):
+    '''define dimensions, variables and attributes of dst following src'''
+
+    dst.setncatts(dict((k,src.getncattr(k)) for k in src.ncattrs()))
+    for name,d in src.dimensions.items():
+        dst.createDimension(name,None if name == dim else len(d))
+
+    for name,v in src.variables.items():
+        kwargs = {}
+        if '_FillValue' in v.ncattrs():
+            kwargs['fill_value'] = v.getncattr('_FillValue')
+        filters = v.filters() or {}
+        if filters.get('zlib'):
+            kwargs.update({'zlib': True,
+                           'complevel': filters['complevel'],
+                           'shuffle': filters['shuffle']})
+        out = dst.createVariable(name,v.datatype,v.dimensions,**kwargs)
+        out.set_auto_maskandscale(False)
+        out.setncatts(dict((k,v.getncattr(k)) for k in v.ncattrs()
+                           if k != '_FillValue'))
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _time_variables(src,dim):
+    '''return the names of the time coordinate and its bounds'''
+    names = [dim]
+    if dim in src.variables:
+        for att in ['bounds','climatology']:
+            if att in src.variables[dim].ncattrs():
+                names.append(src.variables[dim].getncattr(att))
+    return [name for name in names if name in src.variables]
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _rebase(values,units,calendar,units_out):
+    '''convert time values from units to units_out'''
+    import netCDF4
+    if units == units_out:
+        return values
+    dates = netCDF4.num2date(values,units,calendar)
+    return netCDF4.date2num(dates,units_out,calendar).astype(values.dtype)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def concat(input,output,buffer='1GB',read_ahead=True,dim='time'):
+    '''concatenate files along a dimension
+
+    Parameters
+    ----------
+
+    input : list
+      files to concatenate, in order
+    output : str
+      output file
+    buffer : str, optional
+      maximum size of the slab copied at once
+    read_ahead : logical, optional
+      read the next file ahead while copying the current one
+    dim : str, optional
+      dimension to concatenate along
+    '''
+    import netCDF4
+
+    nbuffer = parse_memory(buffer)
+    offset = 0
+    output_tmp = output+'.tmp'
+
+    with netCDF4.Dataset(input[0]) as src:
+        dst = netCDF4.Dataset(output_tmp,'w',format=src.data_model)
+        time_vars = _time_variables(src,dim)
+        units_out,calendar = None,'standard'
+        if time_vars and 'units' in src.variables[dim].ncattrs():
+            units_out = src.variables[dim].getncattr('units')
+            if 'calendar' in src.variables[dim].ncattrs():
+                calendar = src.variables[dim].getncattr('calendar')
+    dst.set_auto_maskandscale(False)
+
+    try:
+        for i,path in enumerate(input):
+            if read_ahead and i+1 < len(input):
+                _read_ahead(input[i+1])
+
+            with netCDF4.Dataset(path) as src:
+                src.set_auto_maskandscale(False)
+                if i == 0:
+                    _define(src,dst,dim)
+
+                #-- units of the time coordinate in this file
+                units = units_out
+                if units_out is not None and 'units' in src.variables[dim].ncattrs():
+                    units = src.variables[dim].getncattr('units')
+
+                n = len(src.dimensions[dim])
+                for name,v in src.variables.items():
+                    if dim not in v.dimensions:
+                        if i == 0:
+                            dst.variables[name][...] = v[...]
+                        continue
+
+                    #-- records per slab
+                    axis = v.dimensions.index(dim)
+                    nbytes = v.dtype.itemsize
+                    for j,size in enumerate(v.shape):
+                        if j != axis:
+                            nbytes *= size
+                    step = max(1,nbuffer//max(nbytes,1))
+
+                    for t in range(0,n,step):
+                        t1 = min(t+step,n)
+                        index_in = [slice(None)]*len(v.shape)
+                        index_out = [slice(None)]*len(v.shape)
+                        index_in[axis] = slice(t,t1)
+                        index_out[axis] = slice(offset+t,offset+t1)
+                        values = v[tuple(index_in)]
+                        if name in time_vars and units is not None:
+                            values = _rebase(values,units,calendar,units_out)
+                        dst.variables[name][tuple(index_out)] = values
+
+                offset += n
+    except:
+        dst.close()
+        os.remove(output_tmp)
+        raise
+
+    dst.close()
+    os.replace(output_tmp,output)
+
+#------------------------------------------------------------
+#-- main
+#------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    p = argparse.ArgumentParser(description='streaming netCDF concatenation')
+    p.add_argument('input',nargs='*')
+    p.add_argument('-o',dest='output',required=True)
+    p.add_argument('-l',dest='file_list',default=None,
+                   help='file holding the list of input files')
+    p.add_argument('-b',dest='buffer',default='1GB')
+    p.add_argument('-d',dest='dim',default='time')
+    p.add_argument('--no-read-ahead',dest='read_ahead',action='store_false')
+    args = p.parse_args()
+
+    input = args.input
+    if args.file_list is not None:
+        with open(args.file_list) as fid:
+            input = input + [l.strip() for l in fid if l.strip()]
+    if not input:
+        print('no input files')
+        sys.exit(1)
+
+    concat(input,args.output,buffer=args.buffer,read_ahead=args.read_ahead,
+           dim=args.dim)
@@ -0,0 +1,168 @@
+import os
+import struct
+
+#------------------------------------------------------------
+#-- settings
+#------------------------------------------------------------
+
+#-- dimensions and variables by (path, size, mtime)
+_cache = {}
+
+_NC_DIMENSION = 10
+_NC_VARIABLE = 11
+_NC_ATTRIBUTE = 12
+_NC_STREAMING = 0xFFFFFFFF
+
+#-- bytes per value by netCDF type
+_nc_type_size = {1: 1, 2: 1, 3: 2, 4: 4, 5: 4, 6: 8,
+                 7: 1, 8: 2, 9: 4, 10: 8, 11: 8}
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _read_classic(fid):
+    '''read the header of a classic netCDF file (CDF-1, CDF-2 or CDF-5);
+    return dimension lengths and, for each variable, its dimensions and
+    bytes per value, or None if the format is not classic or the record
+    count is not set (streaming)'''
+
+    magic = fid.read(4)
+    if magic[:3] != b'CDF' or magic[3:4] not in [b'\x01',b'\x02',b'\x05']:
+        return None
+
+    #-- CDF-5 uses 64-bit counts and lengths; CDF-2 64-bit offsets
+    fmt = '>Q' if magic[3:4] == b'\x05' else '>I'
+    fmt_begin = '>I' if magic[3:4] == b'\x01' else '>Q'
+    read = lambda fmt=fmt: struct.unpack(fmt,fid.read(struct.calcsize(fmt)))[0]
+
+    def read_name():
+        nchar = read()
+        name = fid.read(nchar).decode('UTF-8')
+        fid.read(-nchar%4)
+        return name
+
+    def skip_attributes():
+        tag,natt = read('>I'),read()
+        for i in range(natt if tag == _NC_ATTRIBUTE else 0):
+            read_name()
+            nc_type,nelems = read('>I'),read()
+            nbytes = nelems*_nc_type_size[nc_type]
+            fid.read(nbytes + (-nbytes%4))
+
+    numrecs = read()
+    if fmt == '>I' and numrecs == _NC_STREAMING:
+        return None
+
+    dims = {}
+    tag,ndim = read('>I'),read()
+    for i in range(ndim if tag == _NC_DIMENSION else 0):
+        name = read_name()
+        length = read()
+        dims[name] = numrecs if length == 0 else length
+    dim_names = list(dims.keys())
+
+    skip_attributes()
+
+    variables = {}
+    tag,nvar = read('>I'),read()
+    for i in range(nvar if tag == _NC_VARIABLE else 0):
+        name = read_name()
+        dimids = [read() for j in range(read())]
+        skip_attributes()
+        nc_type = read('>I')
+        read()
+        read(fmt_begin)
+        variables[name] = (tuple(dim_names[d] for d in dimids),
+                           _nc_type_size[nc_type])
+
+    return {'dims': dims, 'variables': variables}
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _read_library(path):
+    '''read the header with netCDF4, or xarray if not installed'''
+    try:
+        import netCDF4
+    except ImportError:
+        import xarray as xr
+        with xr.open_dataset(path,decode_times=False,decode_coords=False) as ds:
+            return {'dims': dict(ds.sizes),
+                    'variables': dict((name,(v.dims,v.dtype.itemsize))
+                                      for name,v in ds.variables.items())}
+
+    with netCDF4.Dataset(path) as nc:
+        return {'dims': dict((name,len(dim))
+                             for name,dim in nc.dimensions.items()),
+                'variables': dict((name,(v.dimensions,getattr(v.dtype,'itemsize',8)))
+                                  for name,v in nc.variables.items())}
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def header(path):
+    '''return the dimensions and variables of a netCDF file
+
+    Classic formats are read from the header directly; netCDF-4 files
+    through netCDF4 (or xarray). Results are cached by path, size and
+    modification time, so unchanged files are read once per process.
+
+    Parameters
+    ----------
+
+    path : str
+      netCDF file
+
+    Returns: dictionary with "dims" (length by name) and "variables"
+    (dimension names and bytes per value by name)
+    '''
+    st = os.stat(path)
+    key = (os.path.abspath(path),st.st_size,st.st_mtime)
+    if key not in _cache:
+        with open(path,'rb') as fid:
+            info = _read_classic(fid)
+        if info is None:
+            info = _read_library(path)
+        _cache[key] = info
+    return _cache[key]
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def dimensions(path):
+    '''return a dictionary of dimension lengths of a netCDF file'''
+    return header(path)['dims']
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def time_length(path,dim='time'):
+    '''return the length of the time dimension of a netCDF file'''
+    dims = dimensions(path)
+    if dim not in dims:
+        raise ValueError('%s: no dimension "%s"'%(path,dim))
+    return dims[dim]
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def record_bytes(path,dim='time'):
+    '''return the size in bytes of one time level of all variables along
+    the time dimension of a netCDF file'''
+    info = header(path)
+    nbytes = 0
+    for dims,itemsize in info['variables'].values():
+        if dim not in dims:
+            continue
+        size = itemsize
+        for d in dims:
+            if d != dim:
+                size *= info['dims'][d]
+        nbytes += size
+    return nbytes
@@ -2,13 +2,18 @@
 from __future__ import print_function
 
 import os
+import errno
 import stat
 import sys
 import socket
 import time
 import re
+import json
+import math
+import getpass
+import signal
 import tempfile
-from subprocess import Popen,PIPE,call
+from subprocess import Popen,PIPE,STDOUT,call
 from datetime import datetime
 from glob import glob
 
@@ -18,41 +23,107 @@ QUEUE_MAX_HOURS = 20.           # trigger "stop" after QUEUE_MAX_HOURS
 
 #-- job lists
 JID = []           # the list of active job IDs
-MAXJOBS = 400      # max number of jobs to keep in the queue
+_os_jobs = {}         # local jobs by job ID (Q_SYSTEM = None)
+_os_pending = []      # local job IDs with tasks not yet started
+_job_time_limit = {}  # requested walltime (seconds) by job ID
+_job_partition = {}   # requested partition by job ID
 
-#--  account
-ACCOUNT = 'NCGD0011'
+#-- throttling of submission: at MAXJOBS (high-water mark), block until
+#-- the active job count drops to MAXJOBS_LOW (low-water mark)
+MAXJOBS = 400        # max number of jobs to keep in the queue
+MAXJOBS_LOW = None   # resume submitting at this count (default MAXJOBS-1)
+MAXJOBS_PARTITION = {} # optional limits by partition, e.g. {'dav': 100}
+
+#-- partition (queue) for jobs submitted without one, by queue system
+DEFAULT_PARTITION = {'SLURM': 'dav', 'PBS': 'casper'}
+
+#-- max number of job IDs per scancel/qdel/bkill call (see kill)
+KILL_CHUNK = 500
+
+#-- max number of job IDs per squeue/sacct/qstat query (see _scheduler_query)
+QUERY_CHUNK = 500
+
+#-- polling of the queue system while waiting on jobs
+POLL_MIN_INTERVAL = 1.     # seconds between passes when jobs change state
+POLL_MAX_INTERVAL = 120.   # ceiling on the interval while nothing changes
+POLL_BACKOFF = 1.5         # growth factor of the interval while nothing changes
 
 #-- default conda environment for analyses
 CONDA_ENV = 'analysis'
 CONDA_PATH = 'PATH=/glade/work/mclong/miniconda3/bin'
 
-USER_MAIL = os.environ['USER']+'@ucar.edu'
-
-#-- machine dependencies
-hostname = socket.gethostname()
-if any(s in hostname for s in ['cheyenne','casper']):
-    Q_SYSTEM = 'SLURM'
-    SCRATCH = os.path.join('/glade/scratch',os.environ['USER'])
-elif "crhtc" in hostname:
-    Q_SYSTEM='PBS'
-    SCRATCH = os.path.join('/glade/scratch',os.environ['USER'])
-else:
-    #TODO: implement Q_SYSTEM = None
-    raise ValueError('hostname not found')
-
+#-- max number of concurrent processes when Q_SYSTEM is None
+try:
+    LOCAL_MAXPROCS = len(os.sched_getaffinity(0))
+except AttributeError:
+    LOCAL_MAXPROCS = os.cpu_count()
 
 #-- where to place log and run file output output
 JOB_FILE_PREFIX = 'task_manager.calc'
-TMPDIR = os.path.join(SCRATCH,'tmp')
-if not os.path.exists(TMPDIR):
-    stat2 = call(['mkdir','-p',TMPDIR])
-    if stat2 != 0: raise
 
-JOB_LOG_DIR = os.path.join(SCRATCH,'task-manager')
-if not os.path.exists(JOB_LOG_DIR):
-    stat = call(['mkdir','-p',JOB_LOG_DIR])
-    if stat != 0: raise
+#-- site settings, resolved on first use (see _configure) from, in order:
+#-- values assigned to the module attribute (e.g., task_manager.ACCOUNT),
+#-- TASK_MANAGER_<NAME> environment variables, the JSON file named by
+#-- TASK_MANAGER_CONFIG, and defaults for the host
+_config_names = ['Q_SYSTEM','SCRATCH','TMPDIR','JOB_LOG_DIR','ACCOUNT','USER_MAIL']
+_config_file = os.path.join('~','.config','workflow','task_manager.json')
+_configured = False
+
+#-- environment variable holding the task index within a job array
+ARRAY_INDEX_VAR = 'TM_ARRAY_INDEX'
+
+#-- max number of tasks in one job array (SLURM MaxArraySize default 1001);
+#-- larger task sets are split into several arrays (see chunktime.apply)
+MAX_ARRAY_SIZE = 1000
+
+#-- completion records: batch scripts write exit code, timing, host and
+#-- peak memory to SESSION_DIR; the wait loop picks these up with a
+#-- directory scan and queries the queue system for the remaining jobs
+#-- at most every SENTINEL_QUERY_INTERVAL seconds
+SENTINEL = True
+SENTINEL_QUERY_INTERVAL = 60.
+SESSION_DIR = None  # set on first submission
+_sentinel_jobs = {}     # record file name and number of tasks by job ID
+_sentinel_records = {}  # parsed records by file name
+_sentinel_scan_mtime = None
+_status_cache = {}      # last queue system status by job ID
+_status_cache_time = 0.
+
+#-- persistent journal of submissions (see open_journal)
+JOURNAL = None
+_journal_keys = {}  # task key by job ID, for jobs of this run
+
+#-- run scripts and logs go to dated subdirectories of JOB_LOG_DIR;
+#-- LOG_INDEX records their paths by job ID for peek
+LOG_INDEX = True
+_log_index = None
+
+#-- usage history: peak memory and run time of finished jobs by task
+#-- class (script and input size); memory='auto' and time_limit='auto'
+#-- request a high percentile of the history plus a margin
+USAGE = True
+USAGE_PERCENTILE = 95.
+USAGE_MEMORY_MARGIN = 1.2
+USAGE_TIME_MARGIN = 1.5
+USAGE_MIN_TIME = 600       # seconds
+USAGE_MIN_SAMPLES = 3
+_usage_history = None
+_job_usage_class = {}      # task class by job ID
+_usage_interpreters = ['python','pypy','bash','sh','ksh','csh','tcsh',
+                       'perl','Rscript','julia','ncl','env','time']
+
+#-- bundling of short commands into shared batch jobs (see bundle_start)
+BUNDLE = None         # bundling settings while active
+_bundle_pending = {}  # commands awaiting submission, by submit arguments
+_bundle_members = {}  # bundle job ID and record name by member ID
+_bundle_count = 0
+
+#-- resubmission of failed jobs (see RetryPolicy); None: off
+RETRY = None
+_job_submit = {}     # command, submit arguments and attempt by job ID
+_job_depends = {}    # dependencies by job ID, for retry and failure propagation
+_retry_pending = {}  # time due and submit arguments by failed job ID
+_retry_map = {}      # resubmitted job ID by failed job ID
 
 #-- job status codes
 _job_stat_run = 'RUN'
@@ -61,6 +132,109 @@ _job_stat_fail = 'FAILED'
 _job_stat_pend = 'PENDING'
 _job_stat_recheck = 'RECHECK'
 
+#-- map SLURM job states to status codes
+_slurm_stat_codes = {'RUNNING': _job_stat_run,
+                     'CONFIGURING': _job_stat_run,
+                     'COMPLETED': _job_stat_done,
+                     'COMPLETING': _job_stat_recheck,
+                     'FAILED': _job_stat_fail,
+                     'TIMEOUT': _job_stat_fail,
+                     'CANCELLED': _job_stat_fail,
+                     'OUT_OF_MEMORY':_job_stat_fail,
+                     'NODE_FAIL': _job_stat_fail,
+                     'BOOT_FAIL': _job_stat_fail,
+                     'PREEMPTED': _job_stat_fail,
+                     'DEADLINE': _job_stat_fail,
+                     'SUSPENDED': _job_stat_run,
+                     'REQUEUED': _job_stat_pend,
+                     'PENDING': _job_stat_pend}
+
+#-- failure reasons (see RetryPolicy) by SLURM state and PBS exit status
+_slurm_fail_reasons = {'OUT_OF_MEMORY': 'OOM',
+                       'TIMEOUT': 'TIMEOUT',
+                       'DEADLINE': 'TIMEOUT',
+                       'NODE_FAIL': 'NODE_FAIL',
+                       'BOOT_FAIL': 'NODE_FAIL',
+                       'PREEMPTED': 'NODE_FAIL',
+                       'CANCELLED': 'CANCELLED'}
+_pbs_fail_reasons = {-27: 'OOM',      # JOB_EXEC_KILL_MEM
+                     -26: 'OOM',      # JOB_EXEC_KILL_VMEM
+                     -29: 'TIMEOUT',  # JOB_EXEC_KILL_WALLTIME
+                     -28: 'TIMEOUT'}  # JOB_EXEC_KILL_CPUT
+_fail_reason_order = ['OOM','TIMEOUT','NODE_FAIL','FAILED','CANCELLED']
+
+#------------------------------------------------------------------------
+#--- FUNCTION
+#------------------------------------------------------------------------
+
+def __getattr__(name):
+    '''
+    resolve site settings on first access from outside the module
+    '''
+    if name in _config_names:
+        _configure()
+        return globals()[name]
+    raise AttributeError("module '%s' has no attribute '%s'"%(__name__,name))
+
+#------------------------------------------------------------------------
+#--- FUNCTION
+#------------------------------------------------------------------------
+
+def _configure():
+    '''
+    resolve site settings not assigned explicitly and create the
+    scratch directories; called by the public functions before first use
+    '''
+    global _configured
+    if _configured:
+        return
+
+    config = {}
+    config_file = os.path.expanduser(os.environ.get('TASK_MANAGER_CONFIG',
+                                                    _config_file))
+    if os.path.exists(config_file):
+        with open(config_file) as fid:
+            config = json.load(fid)
+
+    for name in _config_names:
+        if 'TASK_MANAGER_'+name in os.environ:
+            config[name] = os.environ['TASK_MANAGER_'+name]
+    if config.get('Q_SYSTEM') in ['','None','none','local']:
+        config['Q_SYSTEM'] = None
+
+    #-- machine dependencies
+    user = getpass.getuser()
+    hostname = socket.gethostname()
+    if any(s in hostname for s in ['cheyenne','casper']):
+        default = {'Q_SYSTEM': 'SLURM',
+                   'SCRATCH': os.path.join('/glade/scratch',user)}
+    elif "crhtc" in hostname:
+        default = {'Q_SYSTEM': 'PBS',
+                   'SCRATCH': os.path.join('/glade/scratch',user)}
+    else:
+        #-- no queue system: run jobs as local processes
+        default = {'Q_SYSTEM': None,
+                   'SCRATCH': os.environ.get('SCRATCH',
+                                             os.path.join(tempfile.gettempdir(),user))}
+    default['ACCOUNT'] = 'NCGD0011'
+    default['USER_MAIL'] = user+'@ucar.edu'
+
+    #-- in order: directories default to subdirectories of SCRATCH
+    settings = globals()
+    for name in _config_names:
+        if name == 'TMPDIR':
+            default[name] = os.path.join(settings['SCRATCH'],'tmp')
+        elif name == 'JOB_LOG_DIR':
+            default[name] = os.path.join(settings['SCRATCH'],'task-manager')
+        if name not in settings:
+            settings[name] = config.get(name,default.get(name))
+
+    for path in [settings['TMPDIR'],settings['JOB_LOG_DIR']]:
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    _configured = True
+
 #------------------------------------------------------------------------
 #--- FUNCTION
 #------------------------------------------------------------------------
@@ -87,10 +261,165 @@ def total_elapsed_time():
 #--- FUNCTION
 #------------------------------------------------------------------------
 
-def _wait_on_jobs(job_wait_list=[],njob_target=0):
+def _time_limit_seconds(time_limit):
+    '''
+    convert a walltime string ("minutes", "MM:SS", "HH:MM:SS" or
+    "D-HH:MM:SS") to seconds
+    '''
+    days = 0
+    if '-' in time_limit:
+        days,time_limit = time_limit.split('-',1)
+        days = int(days)
+
+    fields = [int(f) for f in time_limit.split(':')]
+    if len(fields) == 1:
+        seconds = fields[0]*60
+    elif len(fields) == 2:
+        seconds = fields[0]*60 + fields[1]
+    else:
+        seconds = fields[0]*3600 + fields[1]*60 + fields[2]
+
+    return days*86400 + seconds
+
+#------------------------------------------------------------------------
+#--- FUNCTION
+#------------------------------------------------------------------------
+
+def _format_time_limit(seconds):
+    '''
+    convert seconds to a walltime string ("HH:MM:SS"), rounding up to
+    whole minutes
+    '''
+    minutes = int(math.ceil(seconds/60.))
+    return '%02d:%02d:00'%(minutes//60,minutes%60)
+
+#------------------------------------------------------------------------
+#--- FUNCTION
+#------------------------------------------------------------------------
+
+def parse_memory(memory):
+    '''
+    convert a memory request (e.g., "100GB", "500MB", "4G") to bytes
+    '''
+    units = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+    match = re.match(r'^\s*([0-9.]+)\s*([KMGT]?)B?\s*$',memory.upper())
+    if match is None:
+        raise ValueError('Cannot parse memory request: %s'%memory)
+    return int(float(match.group(1))*units[match.group(2)])
+
+#------------------------------------------------------------------------
+#--- FUNCTION
+#------------------------------------------------------------------------
+
+def format_memory(nbytes):
+    '''
+    convert bytes to a memory request, rounding up to whole GB (or MB)
+    '''
+    if nbytes < 2**30:
+        return '%dMB'%max(-(-nbytes//2**20),1)
+    return '%dGB'%(-(-nbytes//2**30))
+
+#------------------------------------------------------------------------
+#--- CLASS
+#------------------------------------------------------------------------
+
+class PollPolicy(object):
+    '''
+    adaptive interval between passes of the wait loop
+
+    the interval grows by `backoff` on every pass without a state change,
+    up to `max_interval`; it drops back to `min_interval` when any job
+    changes state and is shortened so that the loop wakes up at the
+    expected end time of a running job
+    '''
+
+    def __init__(self,min_interval=None,max_interval=None,backoff=None):
+        if min_interval is None:
+            min_interval = POLL_MIN_INTERVAL
+        if max_interval is None:
+            max_interval = POLL_MAX_INTERVAL
+        if backoff is None:
+            backoff = POLL_BACKOFF
+
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval),self.min_interval)
+        self.backoff = float(backoff)
+        self.interval = self.min_interval
+
+    def next_interval(self,nchanged=0,time_to_end=None):
+        '''
+        return the number of seconds to sleep before the next pass
+        given the number of jobs that changed state on this pass and the
+        time remaining until the earliest expected job end (or None)
+        '''
+        if nchanged:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval*self.backoff,self.max_interval)
+
+        if time_to_end is not None:
+            self.interval = max(self.min_interval,
+                                min(self.interval,time_to_end))
+        return self.interval
+
+#------------------------------------------------------------------------
+#--- CLASS
+#------------------------------------------------------------------------
+
+class RetryPolicy(object):
+    '''
+    resubmission of failed jobs, assigned to task_manager.RETRY
+
+    jobs that fail for a reason in `reasons` are resubmitted after
+    backoff*2**(n-1) seconds on the n-th retry, up to `max_attempts`
+    submissions in all: "OOM" with memory scaled by `memory_factor`,
+    "TIMEOUT" with time_limit scaled by `time_factor`, "NODE_FAIL"
+    (node failure, preemption) unchanged. Other failures ("FAILED",
+    "CANCELLED") are final unless listed. Jobs depending on a failed job
+    are moved to its replacement.
+    '''
+
+    def __init__(self,max_attempts=3,memory_factor=2.,time_factor=2.,
+                 backoff=30.,reasons=['OOM','TIMEOUT','NODE_FAIL']):
+        self.max_attempts = int(max_attempts)
+        self.memory_factor = float(memory_factor)
+        self.time_factor = float(time_factor)
+        self.backoff = float(backoff)
+        self.reasons = list(reasons)
+
+    def retry_kwargs(self,reason,kwargs,attempt):
+        '''
+        return the submit arguments for the next attempt of a job that
+        failed on attempt `attempt`, or None to give up
+        '''
+        if attempt >= self.max_attempts or reason not in self.reasons:
+            return None
+
+        #-- dependencies were met by the failed attempt
+        kwargs = dict(kwargs)
+        kwargs.pop('depjob',None)
+
+        if reason == 'OOM':
+            memory = parse_memory(kwargs.get('memory') or '100GB')
+            kwargs['memory'] = format_memory(int(memory*self.memory_factor))
+        elif reason == 'TIMEOUT':
+            seconds = _time_limit_seconds(kwargs.get('time_limit') or '24:00:00')
+            kwargs['time_limit'] = _format_time_limit(seconds*self.time_factor)
+        return kwargs
+
+    def delay(self,attempt):
+        '''seconds to wait before resubmitting after attempt `attempt`'''
+        return self.backoff*2**(attempt-1)
+
+#------------------------------------------------------------------------
+#--- FUNCTION
+#------------------------------------------------------------------------
+
+def _wait_on_jobs(job_wait_list=[],njob_target=0,poll=None):
     '''
     wait on a list of job IDs
     return when the number of running jobs has reached njob_target
+    poll is a PollPolicy (or a fixed interval in seconds)
     '''
 
     ok = True
@@ -98,6 +427,10 @@ def _wait_on_jobs(job_wait_list=[],njob_target=0):
     if not job_wait_list:
         job_wait_list = JID
 
+    #-- follow jobs that have been resubmitted
+    if _retry_map:
+        job_wait_list[:] = [_retry_latest(jid) for jid in job_wait_list]
+
     #-- check total time
     stop_now = False
     if total_elapsed_time() > QUEUE_MAX_HOURS:
@@ -118,45 +451,86 @@ def _wait_on_jobs(job_wait_list=[],njob_target=0):
         print('-'*50)
         print()
 
+    if poll is None:
+        poll = PollPolicy()
+    elif not isinstance(poll,PollPolicy):
+        poll = PollPolicy(poll,poll)
+
     #-- wait on jobs
     job_status = {}
+    run_start = {}
+    finished = set()
     first_run = True
     fail_list = []
     while (njob_running > njob_target):
 
+        #-- query status of all active jobs at once
+        job_status_all = status_list(job_wait_list)
+
+        #-- schedule resubmission of newly failed jobs; wait on those
+        #-- the queue system has not yet settled
+        retry_unsettled = []
+        if RETRY is not None:
+            retry_unsettled = _retry_schedule(
+                [jid for jid in job_wait_list
+                 if job_status_all[jid] == _job_stat_fail
+                 and jid not in _retry_pending])
+
         #-- loop over active jobs
         active_jobs = []
+        resubmit = []
+        nfail = len(fail_list)
+        nchanged = 0
+        journal_states = {}
+        usage_done = []
         for jid in job_wait_list:
 
             #-- check status and report on first pass or if changed
-            job_status_jid = status(jid)
+            job_status_jid = job_status_all[jid]
+
+            if not first_run and not job_status[jid] == job_status_jid:
+                nchanged += 1
+
+            if first_run or not job_status[jid] == job_status_jid:
+                if job_status_jid is None:
+                    journal_states[jid] = _job_stat_done
+                else:
+                    journal_states[jid] = job_status_jid
+                if job_status_jid == _job_stat_done and jid in _job_usage_class:
+                    usage_done.append(jid)
 
             if njob_target == 0:
                 if not first_run:
                     if not job_status[jid] == job_status_jid:
-                        report_status(jid+' status: '+job_status_jid)
+                        report_status(jid+' status: '+str(job_status_jid))
                 else:
                     report_status(jid+' status: '+str(job_status_jid))
             job_status[jid] = job_status_jid
 
+            if job_status_jid == _job_stat_run and jid not in run_start:
+                run_start[jid] = time.time()
+
             #-- status dependent actions
             if job_status_jid in [_job_stat_pend,_job_stat_run]:
                 active_jobs.append(jid)
 
-                #-- test if job had dependencies
-                dependencies_list = job_dependencies(jid)
-                if dependencies_list:
-                    #-- kill if any these in fail_list
-                    if any(j in fail_list for j in dependencies_list):
-                        kill(jid)
-                        report_status(jid+' killed due to failed dependencies')
-
             elif job_status_jid == _job_stat_done:
                 pass
 
-            elif job_status_jid is None: #-- assume the job has completed successfully (the queueing system forgets)
+            #-- assume the job has completed successfully (the queueing system
+            #-- forgets); jobs expected to write completion records are
+            #-- reported FAILED instead (see _job_status_list)
+            elif job_status_jid is None:
                 pass
 
+            elif job_status_jid == _job_stat_fail and jid in _retry_pending:
+                active_jobs.append(jid)
+                if time.time() >= _retry_pending[jid][0]:
+                    resubmit.append(jid)
+
+            elif job_status_jid == _job_stat_fail and jid in retry_unsettled:
+                active_jobs.append(jid)
+
             elif job_status_jid == _job_stat_fail:
                 fail_list.append(jid)
                 ok = False
@@ -164,17 +538,61 @@ def _wait_on_jobs(job_wait_list=[],njob_target=0):
                 ok = False
                 report_status(jid+' unknown message: '+job_status_jid)
 
+        #-- record state changes in the journal
+        if JOURNAL is not None:
+            JOURNAL.update(dict((_journal_keys[jid],state)
+                                for jid,state in journal_states.items()
+                                if jid in _journal_keys),
+                           [_job_stat_done,_job_stat_fail])
+
+        #-- record resource usage of finished jobs
+        if usage_done:
+            _record_usage(usage_done)
+
+        #-- cancel everything downstream of new failures in one call
+        if len(fail_list) > nfail:
+            kill_list = _dependents(fail_list[nfail:])
+            if kill_list:
+                kill(kill_list)
+                report_status('killed due to failed dependencies: '+
+                              ' '.join(kill_list))
+
+        #-- resubmissions take the place of the failed jobs
+        for jid in resubmit:
+            jid_new = _retry_submit(jid)
+            active_jobs[active_jobs.index(jid)] = jid_new
+            job_status[jid_new] = _job_stat_pend
+            nchanged += 1
+
         #-- update list of active jobs to those still active
+        finished.update(j for j in job_wait_list if j not in active_jobs)
         job_wait_list[:] = active_jobs
         njob_running = len(active_jobs)
         del active_jobs[:]
 
+        #-- time until the earliest expected end of a running job
+        #-- or resubmission of a failed one
+        time_to_end = None
+        for jid in job_wait_list:
+            if jid in _retry_pending:
+                t = _retry_pending[jid][0] - time.time()
+            elif jid in run_start and jid in _job_time_limit:
+                t = run_start[jid] + _job_time_limit[jid] - time.time()
+            else:
+                continue
+            if time_to_end is None or t < time_to_end:
+                time_to_end = t
+
         #-- finish loop
         first_run = False
-        time.sleep(1)
+        if njob_running > njob_target:
+            time.sleep(poll.next_interval(nchanged,time_to_end))
 
     #-- update module variable
-    JID[:] = job_wait_list
+    JID[:] = [jid for jid in JID if jid not in finished]
+    for jid in finished:
+        _job_submit.pop(jid,None)
+        _job_depends.pop(jid,None)
 
     #-- exit with messages
     if total_elapsed_time() > QUEUE_MAX_HOURS:
@@ -201,47 +619,188 @@ def _wait_on_jobs(job_wait_list=[],njob_target=0):
 #---- function
 #----------------------------------------------------------------
 
+def _os_job_state(jid):
+    '''
+    return the status of a local job, combining the states of its tasks
+    '''
+    if jid not in _os_jobs:
+        return None
+
+    job = _os_jobs[jid]
+    states = []
+    for p in job['procs']:
+        if p is None:
+            if job['cancelled']:
+                states.append(_job_stat_fail)
+            else:
+                states.append(_job_stat_pend)
+        else:
+            returncode = p.poll()
+            if returncode is None:
+                states.append(_job_stat_run)
+            elif returncode == 0:
+                states.append(_job_stat_done)
+            else:
+                states.append(_job_stat_fail)
+
+    return _array_state(states)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _os_dispatch():
+    '''
+    start pending local tasks whose dependencies have completed,
+    keeping at most LOCAL_MAXPROCS processes running
+    '''
+
+    nrunning = len([p for job in _os_jobs.values() for p in job['procs']
+                    if p is not None and p.poll() is None])
+
+    for jid in _os_pending[:]:
+        if nrunning >= LOCAL_MAXPROCS:
+            break
+
+        job = _os_jobs[jid]
+        if job['cancelled']:
+            _os_pending.remove(jid)
+            continue
+
+        #-- hold until dependencies are done; cancel if any failed
+        #-- and will not be resubmitted
+        dep_status = [_os_job_state(d) for d in job['depjob']]
+        dep_failed = [d for d,s in zip(job['depjob'],dep_status)
+                      if s == _job_stat_fail]
+        if dep_failed and not any(_os_retry_possible(d) for d in dep_failed):
+            report_status(jid+' cancelled due to failed dependencies')
+            job['cancelled'] = True
+            _os_pending.remove(jid)
+            continue
+        elif any(s not in [_job_stat_done,None] for s in dep_status):
+            continue
+
+        for i,p in enumerate(job['procs']):
+            if p is not None:
+                continue
+            if nrunning >= LOCAL_MAXPROCS:
+                break
+
+            env = os.environ.copy()
+            env['TMPDIR'] = TMPDIR
+            env[ARRAY_INDEX_VAR] = str(i)
+            with open(job['log'][i],'w') as fid:
+                job['procs'][i] = Popen(['/bin/bash',job['script']],
+                                        stdin=None,
+                                        stdout=fid,
+                                        stderr=STDOUT,
+                                        env=env,
+                                        start_new_session=True)
+            nrunning += 1
+
+        if None not in job['procs']:
+            _os_pending.remove(jid)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
 def _os_status(jid):
-    return _job_stat_done
+    _os_dispatch()
+    return _os_job_state(jid)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _os_kill(jid):
+    if jid not in _os_jobs:
+        return
+
+    job = _os_jobs[jid]
+    job['cancelled'] = True
+    for p in job['procs']:
+        if p is not None and p.poll() is None:
+            try:
+                os.killpg(p.pid,signal.SIGTERM)
+            except OSError:
+                pass
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _os_retry_possible(jid):
+    '''
+    return True if a failed local job may yet be resubmitted
+    '''
+    if jid in _retry_pending:
+        return True
+    if RETRY is None or jid not in _job_submit:
+        return False
+    cmdi,kwargs,attempt = _job_submit[jid]
+    return RETRY.retry_kwargs('FAILED',kwargs,attempt) is not None
 
 #----------------------------------------------------------------
 #---- function
 #----------------------------------------------------------------
 
-def _os_call(command,**kwargs):
+def _os_call(command,array=None,depjob=None,**kwargs):
+    '''
+    run a command as a local background process; processes are started
+    by _os_dispatch as slots and dependencies allow
+    '''
     ok = True
     stop = False
     cmd_line = []
     if isinstance(command[0],list):
-        cmd_line = 'set -e ; '+'; '.join([' '.join(cmd) for cmd in command])
+        cmd_line = ['set -e']+[' '.join(cmd) for cmd in command]
     else:
-        cmd_line = ' '.join(command)
+        cmd_line = [' '.join(command)]
 
-    env = os.environ.copy()
+    if depjob is None:
+        depjob = []
+    elif isinstance(depjob,str):
+        depjob = [depjob]
 
-    p = Popen(cmd_line,
-          stdin=None,
-          stdout=PIPE,
-          stderr=PIPE,
-          env=env,
-          shell=True)
-    stdout, stderr = p.communicate()
+    #-- unique across driver runs sharing a journal or log index
+    jid = '%d.%d'%(os.getpid(),len(_os_jobs)+1)
 
-    stdout = stdout.decode('UTF-8')
-    stderr = stderr.decode('UTF-8')
+    #-- write run script
+    job_datetime = datetime.now().strftime('%Y%m%d-%H%M%S')
+    fid,batch_script_file = tempfile.mkstemp(dir=_job_log_dir(),
+                                             prefix=JOB_FILE_PREFIX+'.'+job_datetime+'.',
+                                             suffix='.run')
+    os.close(fid)
+    with open(batch_script_file,'w') as fid:
+        for line in ['#!/bin/bash']+cmd_line+['exit ${?}']:
+            fid.write('%s\n'%line)
 
-    jid = p.pid
-    ok = p.returncode == 0
+    if array:
+        stdoe = [batch_script_file.replace('.run','.%s_%d.out'%(jid,i))
+                 for i in range(array)]
+    else:
+        stdoe = [batch_script_file.replace('.run','.%s.out'%jid)]
 
-    if not ok:
-        print('os submit failed!')
-        print('Command:')
-        print(cmd_line)
-        print('\nstdout:')
-        print(stdout)
-        print('\nstderr:')
-        print(stderr)
-        raise
+    _os_jobs[jid] = {'script': batch_script_file,
+                     'log': stdoe,
+                     'depjob': list(depjob),
+                     'procs': [None]*len(stdoe),
+                     'cancelled': False}
+    _os_pending.append(jid)
+    JID.append(jid)
+    _log_index_add(jid,batch_script_file,
+                   stdoe[0].replace('_0.out','_%a.out') if array else stdoe[0],
+                   cmd_line)
+
+    _os_dispatch()
+
+    #-- print job id and job submission string
+    scmd = '; '.join(cmd_line)
+    print('-'*50)
+    print('%s (%s): %s'%(jid,os.path.basename(batch_script_file),scmd))
+    print('-'*50)
+    print()
 
     if total_elapsed_time() > QUEUE_MAX_HOURS:
         stop = True
@@ -252,18 +811,20 @@ def _os_call(command,**kwargs):
 #---- function
 #----------------------------------------------------------------
 
-def _slurm_batch_submit(command,
-                        constraint=None,
-                        partition='dav',
-                        account='',
-                        conda_env='',
-                        modules = [],
-                        module_purge = False,
-                        time_limit = '24:00:00',
-                        memory = '100GB',
-                        email = False,
-                        depjob = None,
-                        job_name=''):
+def _qsub(command,
+          constraint=None,
+          partition=None,
+          account='',
+          conda_env='',
+          modules = [],
+          module_purge = False,
+          time_limit = '24:00:00',
+          memory = '100GB',
+          email = False,
+          depjob = None,
+          job_name='',
+          array = None,
+          ncpus = 1):
 
     #-- init return args
     ok = True
@@ -272,6 +833,9 @@ def _slurm_batch_submit(command,
     if not conda_env and CONDA_ENV:
         conda_env = CONDA_ENV
 
+    if not partition:
+        partition = DEFAULT_PARTITION['PBS']
+
     if not account:
         account = ACCOUNT
 
@@ -291,35 +855,43 @@ def _slurm_batch_submit(command,
     #-- get environment...include in batch?
     env = os.environ.copy()
 
-    fid,batch_script_file = tempfile.mkstemp(dir=JOB_LOG_DIR,
+    fid,batch_script_file = tempfile.mkstemp(dir=_job_log_dir(),
                                              prefix=JOB_FILE_PREFIX+'.'+job_datetime+'.',
                                              suffix='.run')
-    stdoe = batch_script_file.replace('.run','.%J.out')
+    os.close(fid)
+    if array and array > 1:
+        stdoe = batch_script_file.replace('.run','.^array_index^.out')
+    else:
+        stdoe = batch_script_file.replace('.run','.out')
 
     #-- construct batch file
     #---- slurm directives
     batch_script_pre = ['#!/bin/bash',
-                        '#SBATCH -J '+job_name.split(' ')[0],
-                        '#SBATCH -n 1',
-                        '#SBATCH --ntasks-per-node=1',
-                        '#SBATCH -p '+partition,
-                        '#SBATCH -A '+account,
-                        '#SBATCH -t '+time_limit,
-                        '#SBATCH --mem='+memory,
-                        '#SBATCH -e '+stdoe,
-                        '#SBATCH -o '+stdoe]
-    if constraint is not None:
-        batch_script_pre.append('#SBATCH -C '+constraint)
+                        '#PBS -N '+job_name.split(' ')[0],
+                        '#PBS -j oe',
+                        '#PBS -o '+stdoe,
+                        '#PBS -l select=1:ncpus=%d:mem='%ncpus+memory,
+                        '#PBS -q '+partition,
+                        '#PBS -A '+account,
+                        '#PBS -l walltime='+time_limit]
+                        #'#SBATCH -e '+stdoe,
+                        #'#SBATCH -o '+stdoe]
+    #if constraint is not None:
+    #    batch_script_pre.append('#SBATCH -C '+constraint)
+
+    #-- PBS arrays must have more than one subjob
+    if array and array > 1:
+        batch_script_pre.append('#PBS -J 0-%d'%(array-1))
 
     if email:
-        batch_script_pre.append('#SBATCH --mail-type=ALL')
-        batch_script_pre.append('#SBATCH --mail-user='+USER_MAIL)
+        batch_script_pre.append('#PBS -m bea')
+        #batch_script_pre.append('#PBS --mail-user='+USER_MAIL)
 
     depjobstr = ''
     if isinstance(depjob,list):
         #-- cull list if status is None
         depjob_culled = [jid for jid in depjob
-                         if _slurm_job_status(jid) is not None]
+                         if _pbs_job_status(jid) is not None]
         if len(depjob) != len(depjob_culled):
             print('Some job dependencies not found:')
             print(depjob)
@@ -329,11 +901,11 @@ def _slurm_batch_submit(command,
         depjobstr = ':'.join(depjob)
 
     elif isinstance(depjob,str):
-        if _slurm_job_status(depjob) is not None:
+        if _pbs_job_status(depjob) is not None:
             depjobstr = depjob
 
     if depjobstr:
-        batch_script_pre.append('#SBATCH -d afterok:'+depjobstr)
+        batch_script_pre.append('#PBS -W depend=afterok:'+depjobstr)
     #---- end slurm directives
 
     batch_script_pre.extend([
@@ -366,6 +938,7 @@ def _slurm_batch_submit(command,
     batch_script_pre.append('export {CONDA_PATH}:$PATH'.format(CONDA_PATH=CONDA_PATH))
     batch_script_pre.append('export PYTHONUNBUFFERED=False')
     batch_script_pre.append('export TMPDIR='+TMPDIR)
+    batch_script_pre.append('export %s=${PBS_ARRAY_INDEX:-0}'%ARRAY_INDEX_VAR)
 
     if module_purge:
         batch_script_pre.append('module purge')
@@ -378,7 +951,11 @@ def _slurm_batch_submit(command,
     if conda_env:
         batch_script_pre.append('source activate %s'%conda_env)
 
-    batch_script_post = ['exit ${?}']
+    if SENTINEL:
+        batch_script_pre.extend(_sentinel_script_pre())
+        batch_script_post = _sentinel_script_post(batch_script_file,array)
+    else:
+        batch_script_post = ['exit ${?}']
 
     #-- write run script
     with open(batch_script_file,'w') as fid:
@@ -390,7 +967,7 @@ def _slurm_batch_submit(command,
     os.chmod(batch_script_file, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH )
 
     #-- submit the job
-    p = Popen(['sbatch',batch_script_file],
+    p = Popen(['qsub',batch_script_file],
               stdin=None,
               stdout=PIPE,
               stderr=PIPE,
@@ -402,8 +979,12 @@ def _slurm_batch_submit(command,
 
     #-- parse return string to get job ID
     try:
+        # Trying to figure out jobid
+        print(stdout)
         jid = stdout.splitlines()[-1].split(' ')[-1].strip()
         JID.append(jid)
+        if SENTINEL:
+            _sentinel_jobs[jid] = (os.path.basename(batch_script_file),array)
     except:
         print('SLURM sbatch failed!')
         print('Command:')
@@ -414,6 +995,10 @@ def _slurm_batch_submit(command,
         print(stderr)
         raise
 
+    _log_index_add(jid,batch_script_file,
+                   stdoe.replace('%J',jid).replace('%A',jid).replace('^array_index^','%a'),
+                   cmd_line)
+
     #-- print job id and job submission string
     scmd = '; '.join(cmd_line)
     print('-'*50)
@@ -427,19 +1012,24 @@ def _slurm_batch_submit(command,
     #-- return job id
     return jid,ok,stop
 
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
 
-def _qsub(command,
-          constraint=None,
-          partition='casper',
-          account='',
-          conda_env='',
-          modules = [],
-          module_purge = False,
-          time_limit = '24:00:00',
-          memory = '100GB',
-          email = False,
-          depjob = None,
-          job_name=''):
+def _slurm_batch_submit(command,
+                        constraint=None,
+                        partition=None,
+                        account='',
+                        conda_env='',
+                        modules = [],
+                        module_purge = False,
+                        time_limit = '24:00:00',
+                        memory = '100GB',
+                        email = False,
+                        depjob = None,
+                        job_name='',
+                        array = None,
+                        ncpus = 1):
 
     #-- init return args
     ok = True
@@ -448,6 +1038,9 @@ def _qsub(command,
     if not conda_env and CONDA_ENV:
         conda_env = CONDA_ENV
 
+    if not partition:
+        partition = DEFAULT_PARTITION['SLURM']
+
     if not account:
         account = ACCOUNT
 
@@ -467,200 +1060,35 @@ def _qsub(command,
     #-- get environment...include in batch?
     env = os.environ.copy()
 
-    fid,batch_script_file = tempfile.mkstemp(dir=JOB_LOG_DIR,
+    fid,batch_script_file = tempfile.mkstemp(dir=_job_log_dir(),
                                              prefix=JOB_FILE_PREFIX+'.'+job_datetime+'.',
                                              suffix='.run')
-    stdoe = batch_script_file.replace('.run','.%J.out')
+    os.close(fid)
+    if array:
+        stdoe = batch_script_file.replace('.run','.%A_%a.out')
+    else:
+        stdoe = batch_script_file.replace('.run','.%J.out')
 
     #-- construct batch file
     #---- slurm directives
     batch_script_pre = ['#!/bin/bash',
-                        '#PBS -N '+job_name.split(' ')[0],
-                        '#PBS -l select=1:ncpus=1:mem='+memory,
-                        '#PBS -q '+partition,
-                        '#PBS -A '+account,
-                        '#PBS -l walltime='+time_limit]
-                        #'#SBATCH -e '+stdoe,
-                        #'#SBATCH -o '+stdoe]
-    #if constraint is not None:
-    #    batch_script_pre.append('#SBATCH -C '+constraint)
+                        '#SBATCH -J '+job_name.split(' ')[0],
+                        '#SBATCH -n 1',
+                        '#SBATCH --ntasks-per-node=1',
+                        '#SBATCH -p '+partition,
+                        '#SBATCH -A '+account,
+                        '#SBATCH -t '+time_limit,
+                        '#SBATCH --mem='+memory,
+                        '#SBATCH -e '+stdoe,
+                        '#SBATCH -o '+stdoe]
+    if constraint is not None:
+        batch_script_pre.append('#SBATCH -C '+constraint)
 
-    if email:
-        batch_script_pre.append('#PBS -m bea')
-        #batch_script_pre.append('#PBS --mail-user='+USER_MAIL)
+    if array:
+        batch_script_pre.append('#SBATCH --array=0-%d'%(array-1))
 
-    depjobstr = ''
-    if isinstance(depjob,list):
-        #-- cull list if status is None
-        depjob_culled = [jid for jid in depjob
-                         if _slurm_job_status(jid) is not None]
-        if len(depjob) != len(depjob_culled):
-            print('Some job dependencies not found:')
-            print(depjob)
-            print(depjob_culled)
-            depjob = depjob_culled
-
-        depjobstr = ':'.join(depjob)
-
-    elif isinstance(depjob,str):
-        if _slurm_job_status(depjob) is not None:
-            depjobstr = depjob
-
-    if depjobstr:
-        batch_script_pre.append('#SBATCH -d afterok:'+depjobstr)
-    #---- end slurm directives
-
-    batch_script_pre.extend([
-        'if [ -z $MODULEPATH_ROOT ]; then',
-        '  unset MODULEPATH_ROOT',
-        'else',
-        '  echo "NO MODULEPATH_ROOT TO RESET"',
-        'fi',
-        'if [ -z $MODULEPATH ]; then',
-        '  unset MODULEPATH',
-        'else',
-        '  echo "NO MODULEPATH TO RESET"',
-        'fi',
-        'if [ -z $LMOD_SYSTEM_DEFAULT_MODULES ]; then',
-        '  unset LMOD_SYSTEM_DEFAULT_MODULES',
-        'else',
-        '  echo "NO LMOD_SYSTEM_DEFAULT_MODULES TO RESET"',
-        'fi',
-        'source /etc/profile',
-        'export TERM='+env['TERM'],
-        'export HOME='+env['HOME']])
-
-    #-- I get the following error in Python reading netcdf4 files:
-    # ImportError: /lib64/libk5crypto.so.3: symbol krb5int_buf_len, version
-    #   krb5support_0_MIT not defined in file libkrb5support.so.0 with link time
-    #   reference
-    # this fixes it:
-    batch_script_pre.append('unset LD_LIBRARY_PATH')
-
-    batch_script_pre.append('export {CONDA_PATH}:$PATH'.format(CONDA_PATH=CONDA_PATH))
-    batch_script_pre.append('export PYTHONUNBUFFERED=False')
-    batch_script_pre.append('export TMPDIR='+TMPDIR)
-
-    if module_purge:
-        batch_script_pre.append('module purge')
-
-    if modules:
-        for module in modules:
-            batch_script_pre.append('module load '+module)
-        batch_script_pre.append('module list')
-
-    if conda_env:
-        batch_script_pre.append('source activate %s'%conda_env)
-
-    batch_script_post = ['exit ${?}']
-
-    #-- write run script
-    with open(batch_script_file,'w') as fid:
-        for line in batch_script_pre+cmd_line+batch_script_post:
-            fid.write('%s\n'%line)
-
-    #-- make run script executable
-    st = os.stat(batch_script_file)
-    os.chmod(batch_script_file, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH )
-
-    #-- submit the job
-    p = Popen(['qsub',batch_script_file],
-              stdin=None,
-              stdout=PIPE,
-              stderr=PIPE,
-              env=env)
-    stdout, stderr = p.communicate()
-
-    stdout = stdout.decode('UTF-8')
-    stderr = stderr.decode('UTF-8')
-
-    #-- parse return string to get job ID
-    try:
-        # Trying to figure out jobid
-        print(stdout)
-        jid = stdout.splitlines()[-1].split(' ')[-1].strip()
-        JID.append(jid)
-    except:
-        print('SLURM sbatch failed!')
-        print('Command:')
-        print(command)
-        print('\nstdout:')
-        print(stdout)
-        print('\nstderr:')
-        print(stderr)
-        raise
-
-    #-- print job id and job submission string
-    scmd = '; '.join(cmd_line)
-    print('-'*50)
-    print('%s (%s): %s'%(jid,os.path.basename(batch_script_file),scmd))
-    print('-'*50)
-    print()
-
-    if total_elapsed_time() > QUEUE_MAX_HOURS:
-        stop = True
-
-    #-- return job id
-    return jid,ok,stop
-
-def _slurm_batch_submit(command,
-                        constraint=None,
-                        partition='dav',
-                        account='',
-                        conda_env='',
-                        modules = [],
-                        module_purge = False,
-                        time_limit = '24:00:00',
-                        memory = '100GB',
-                        email = False,
-                        depjob = None,
-                        job_name=''):
-
-    #-- init return args
-    ok = True
-    stop = False
-
-    if not conda_env and CONDA_ENV:
-        conda_env = CONDA_ENV
-
-    if not account:
-        account = ACCOUNT
-
-    #-- determine the job name if not provided
-    cmd_line = []
-    if isinstance(command[0],list):
-        cmd_line = [' '.join(cmd) for cmd in command]
-    else:
-        cmd_line = [' '.join(command)]
-
-    if not job_name:
-        job_name = cmd_line[0].split(' ')[0]
-
-    #-- set up batch script
-    job_datetime = datetime.now().strftime('%Y%m%d-%H%M%S')
-
-    #-- get environment...include in batch?
-    env = os.environ.copy()
-
-    fid,batch_script_file = tempfile.mkstemp(dir=JOB_LOG_DIR,
-                                             prefix=JOB_FILE_PREFIX+'.'+job_datetime+'.',
-                                             suffix='.run')
-    stdoe = batch_script_file.replace('.run','.%J.out')
-
-    #-- construct batch file
-    #---- slurm directives
-    batch_script_pre = ['#!/bin/bash',
-                        '#SBATCH -J '+job_name.split(' ')[0],
-                        '#SBATCH -n 1',
-                        '#SBATCH --ntasks-per-node=1',
-                        '#SBATCH -p '+partition,
-                        '#SBATCH -A '+account,
-                        '#SBATCH -t '+time_limit,
-                        '#SBATCH --mem='+memory,
-                        '#SBATCH -e '+stdoe,
-                        '#SBATCH -o '+stdoe]
-    if constraint is not None:
-        batch_script_pre.append('#SBATCH -C '+constraint)
+    if ncpus > 1:
+        batch_script_pre.append('#SBATCH --cpus-per-task=%d'%ncpus)
 
     if email:
         batch_script_pre.append('#SBATCH --mail-type=ALL')
@@ -717,6 +1145,7 @@ def _slurm_batch_submit(command,
     batch_script_pre.append('export {CONDA_PATH}:$PATH'.format(CONDA_PATH=CONDA_PATH))
     batch_script_pre.append('export PYTHONUNBUFFERED=False')
     batch_script_pre.append('export TMPDIR='+TMPDIR)
+    batch_script_pre.append('export %s=${SLURM_ARRAY_TASK_ID:-0}'%ARRAY_INDEX_VAR)
 
     if module_purge:
         batch_script_pre.append('module purge')
@@ -729,7 +1158,11 @@ def _slurm_batch_submit(command,
     if conda_env:
         batch_script_pre.append('source activate %s'%conda_env)
 
-    batch_script_post = ['exit ${?}']
+    if SENTINEL:
+        batch_script_pre.extend(_sentinel_script_pre())
+        batch_script_post = _sentinel_script_post(batch_script_file,array)
+    else:
+        batch_script_post = ['exit ${?}']
 
     #-- write run script
     with open(batch_script_file,'w') as fid:
@@ -755,6 +1188,8 @@ def _slurm_batch_submit(command,
     try:
         jid = stdout.splitlines()[-1].split(' ')[-1].strip()
         JID.append(jid)
+        if SENTINEL:
+            _sentinel_jobs[jid] = (os.path.basename(batch_script_file),array)
     except:
         print('SLURM sbatch failed!')
         print('Command:')
@@ -765,6 +1200,10 @@ def _slurm_batch_submit(command,
         print(stderr)
         raise
 
+    _log_index_add(jid,batch_script_file,
+                   stdoe.replace('%J',jid).replace('%A',jid).replace('^array_index^','%a'),
+                   cmd_line)
+
     #-- print job id and job submission string
     scmd = '; '.join(cmd_line)
     print('-'*50)
@@ -874,7 +1313,9 @@ def _slurm_job_dependencies(jid):
     elif status_dict['Dependency'] == '(null)':
         return []
     else:
-        return [s.split(':')[1] for s in status_dict['Dependency'].split(',')]
+        #-- e.g., "afterok:123(unfulfilled),afterok:124(unfulfilled)"
+        return [s.split(':')[1].split('(')[0]
+                for s in status_dict['Dependency'].split(',')]
 
 
 #----------------------------------------------------------------
@@ -886,123 +1327,1253 @@ def _slurm_job_status(jid):
     return job status parsing scontrol command
     '''
 
-    stat_codes = {'RUNNING': _job_stat_run,
-                  'COMPLETED': _job_stat_done,
-                  'COMPLETING': _job_stat_recheck,
-                  'FAILED': _job_stat_fail,
-                  'TIMEOUT': _job_stat_fail,
-                  'CANCELLED': _job_stat_fail,
-                  'OUT_OF_MEMORY':_job_stat_fail,
-                  'PENDING': _job_stat_pend}
-
     status_dict = _slurm_scontrol_show_job(jid)
 
     if status_dict is None:
         return None
-    elif status_dict['JobState'] in stat_codes:
-        return stat_codes[status_dict['JobState']]
     else:
-        raise ValueError('Unknown job status message: %s'%status_dict['JobState'])
+        return _slurm_state(status_dict['JobState'])
 
-### TODO - update for q version
-def _pbs_job_status(jid):
+def _slurm_state(state):
     '''
-    return job status parsing qstat command
+    translate a SLURM job state into a status code
     '''
+    #-- sacct reports "CANCELLED by <uid>"
+    state = state.split(' ')[0]
+    if state in _slurm_stat_codes:
+        return _slurm_stat_codes[state]
+    else:
+        raise ValueError('Unknown job status message: %s'%state)
 
-    stat_codes = {'R': _job_stat_run, # running
-                  'E': _job_stat_recheck, # finished
-                  'W': _job_stat_pend,
-                  'Q': _job_stat_pend} # Pending
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
 
-    status_dict = _pbs_show_job(jid)
+def _scheduler_query(cmd,jid_list=None,jobs_option='--jobs=',max_tries=5):
+    '''
+    run a scheduler query command, retrying on controller timeouts;
+    job IDs in jid_list are passed with jobs_option (e.g., --jobs=1,2),
+    or as separate arguments if jobs_option is None, QUERY_CHUNK at a time
+    return stdout and stderr
+    '''
+    if jid_list is not None:
+        stdout,stderr = '',''
+        for i in range(0,len(jid_list),QUERY_CHUNK):
+            chunk = jid_list[i:i+QUERY_CHUNK]
+            if jobs_option is None:
+                args = chunk
+            else:
+                args = [jobs_option+','.join(chunk)]
+            out,err = _scheduler_query(cmd+args,max_tries=max_tries)
+            stdout += out
+            stderr += err
+        return stdout,stderr
 
-    if status_dict is None:
-        return None
-    elif status_dict['job_state'] == 'F':
-        if int(status_dict['Exit_status']) == 0:
-            return _job_stat_done
-        else:
-            print(f"{status_dict['Exit_status']}, {type(status_dict['Exit_status'])}")
-            return _job_stat_fail
-    # If job state is finished, return job state, otherwise, key off others
-    elif status_dict['job_state'] in stat_codes:
-        return stat_codes[status_dict['job_state']]
-    else:
-        raise ValueError('Unknown job status message: %s'%status_dict['job_state'])
+    for i in range(max_tries):
+        try:
+            p = Popen(cmd, stdin=None, stdout=PIPE, stderr=PIPE)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                #-- command not available (e.g., no accounting)
+                report_status('%s: command not found'%cmd[0])
+                return '',''
+            elif e.errno in [errno.EAGAIN,errno.ENOMEM,errno.EINTR] and i+1 < max_tries:
+                time.sleep(1)
+                continue
+            print('Failed to run %s'%cmd[0])
+            raise
+        stdout, stderr = p.communicate()
+
+        stdout = stdout.decode('UTF-8')
+        stderr = stderr.decode('UTF-8')
+
+        if 'Socket timed out' not in stderr:
+            break
+        time.sleep(1)
 
+    return stdout,stderr
 
 #----------------------------------------------------------------
 #---- function
 #----------------------------------------------------------------
 
-def kill(jid):
-    if Q_SYSTEM is None:
-        call(['kill',jid])
-    elif Q_SYSTEM == 'LSF':
-        call(['bkill',jid])
-    elif Q_SYSTEM == 'SLURM':
-        call(['scancel',jid])
-    elif Q_SYSTEM == 'PBS':
-        call(['qdel',jid])
+def _slurm_job_status_bulk(jid_list):
+    '''
+    return a dictionary of job status for a list of job IDs;
+    query squeue once for all jobs and sacct once for any jobs
+    that have already left the queue
+    '''
+
+    stat_out = dict((jid,None) for jid in jid_list)
+    if not jid_list:
+        return stat_out
+
+    #-- jobs known to the controller; array tasks are listed one per line
+    #-- and reported under the array job ID
+    array_states = {}
+    stdout,stderr = _scheduler_query(['squeue','--noheader','--array',
+                                      '--format=%F %i %T'],jid_list)
+    for line in stdout.splitlines():
+        items = line.split()
+        if len(items) != 3:
+            continue
+        if items[1] in stat_out:
+            stat_out[items[1]] = _slurm_state(items[2])
+        elif items[0] in stat_out:
+            array_states.setdefault(items[0],[]).append(_slurm_state(items[2]))
+
+    #-- jobs that squeue has forgotten
+    missing = [jid for jid in jid_list
+               if stat_out[jid] is None and jid not in array_states]
+    if missing:
+        stdout,stderr = _scheduler_query(['sacct','--noheader',
+                                          '--parsable2','--allocations',
+                                          '--format=JobID,State'],missing)
+        for line in stdout.splitlines():
+            items = line.split('|')
+            if len(items) != 2:
+                continue
+            if items[0] in stat_out:
+                stat_out[items[0]] = _slurm_state(items[1])
+            elif items[0].split('_')[0] in stat_out:
+                array_states.setdefault(items[0].split('_')[0],[]).append(
+                    _slurm_state(items[1]))
+
+    for jid,states in array_states.items():
+        stat_out[jid] = _array_state(states)
+
+    return stat_out
 
 #----------------------------------------------------------------
 #---- function
 #----------------------------------------------------------------
 
-def job_dependencies(jid):
-    if Q_SYSTEM is None:
-        return []
-    elif Q_SYSTEM == 'LSF':
-        return []
-    elif Q_SYSTEM == 'SLURM':
-        return _slurm_job_dependencies(jid)
-    elif Q_SYSTEM == 'PBS':
-        return []
-
+def _array_state(states):
+    '''
+    combine the status of the tasks in a job array:
+    the array is active while any task is active,
+    failed if any task failed and done otherwise
+    '''
+    for stat_code in [_job_stat_recheck,_job_stat_run,_job_stat_pend,
+                      _job_stat_fail]:
+        if stat_code in states:
+            return stat_code
+    return _job_stat_done
 
 #----------------------------------------------------------------
 #---- function
 #----------------------------------------------------------------
 
-def submit(cmdi,**kwargs):
+def _pbs_show_job_bulk(jid_list):
+    '''
+    return a dictionary of job status dictionaries parsing a
+    qstat command per QUERY_CHUNK job IDs
+    '''
 
-    #-- if number of jobs is at max, wait
-    if len(JID) >= MAXJOBS:
-        print('Job count at threshold.')
-        ok = wait(JID,njob_target=0)
-        stop_program(ok)
+    stdout,stderr = _scheduler_query(['qstat','-xf'],jid_list,jobs_option=None)
 
-    if Q_SYSTEM is None:
-        jid,ok,stop = _os_call(cmdi,**kwargs)
-    elif Q_SYSTEM == 'LSF':
-        jid,ok,stop = _bsub(cmdi,**kwargs)
-    elif Q_SYSTEM == 'SLURM':
-        jid,ok,stop = _slurm_batch_submit(cmdi,**kwargs)
-    elif Q_SYSTEM == 'PBS':
-        jid,ok,stop = _qsub(cmdi,**kwargs)
+    status_dicts = {}
+    status_dict = None
+    for line in stdout.splitlines():
+        if line.startswith('Job Id:'):
+            status_dict = {}
+            status_dicts[line.split(':',1)[1].strip()] = status_dict
+        elif status_dict is not None:
+            try:
+                key,val = line.split('=',1)
+                status_dict[key.strip()] = val.strip()
+            except ValueError:
+                pass
 
+    #-- match on the full job ID or its numeric part
+    status_out = {}
+    for jid in jid_list:
+        if jid in status_dicts:
+            status_out[jid] = status_dicts[jid]
+        else:
+            status_out[jid] = None
+            for key,val in status_dicts.items():
+                if key.split('.')[0] == jid.split('.')[0]:
+                    status_out[jid] = val
+                    break
 
-    stop_program(ok,stop)
-    return jid
+    return status_out
 
 #----------------------------------------------------------------
 #---- function
 #----------------------------------------------------------------
 
-def wait(job_wait_list=[],njob_target=0,closeout=False):
-    ok,stop = _wait_on_jobs(job_wait_list,njob_target)
-    if not closeout:
-        stop_program(ok,stop)
-    return ok
+def _pbs_job_status_bulk(jid_list):
+    '''
+    return a dictionary of job status for a list of job IDs
+    using a single qstat command
+    '''
+    if not jid_list:
+        return {}
+
+    return dict((jid,_pbs_state(status_dict))
+                for jid,status_dict in _pbs_show_job_bulk(jid_list).items())
 
 #----------------------------------------------------------------
 #---- function
 #----------------------------------------------------------------
 
-def status(jid):
+### TODO - update for q version
+def _pbs_job_status(jid):
+    '''
+    return job status parsing qstat command
+    '''
+    return _pbs_state(_pbs_show_job(jid))
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _pbs_state(status_dict):
+    '''
+    translate a qstat status dictionary into a status code
+    '''
+
+    stat_codes = {'R': _job_stat_run, # running
+                  'B': _job_stat_run, # array job begun
+                  'E': _job_stat_recheck, # finished
+                  'X': _job_stat_done, # array subjob finished
+                  'H': _job_stat_pend, # held, e.g. on dependencies
+                  'S': _job_stat_pend, # suspended
+                  'U': _job_stat_pend, # suspended on workstation
+                  'T': _job_stat_pend, # in transit
+                  'W': _job_stat_pend,
+                  'Q': _job_stat_pend} # Pending
+
+    if status_dict is None:
+        return None
+    elif status_dict['job_state'] == 'F':
+        #-- array jobs do not report an exit status
+        if int(status_dict.get('Exit_status','0')) == 0:
+            return _job_stat_done
+        else:
+            print(f"{status_dict['Exit_status']}, {type(status_dict['Exit_status'])}")
+            return _job_stat_fail
+    # If job state is finished, return job state, otherwise, key off others
+    elif status_dict['job_state'] in stat_codes:
+        return stat_codes[status_dict['job_state']]
+    else:
+        #-- keep waiting rather than abort the wait loop
+        report_status('Unknown job status message: %s'%status_dict['job_state'])
+        return _job_stat_pend
+
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _session_dir():
+    '''
+    return the directory holding completion records of this driver session
+    '''
+    global SESSION_DIR
+    _configure()
+    if SESSION_DIR is None:
+        SESSION_DIR = os.path.join(JOB_LOG_DIR,'session.%s.%d'%(
+            PROGRAM_START.strftime('%Y%m%d-%H%M%S'),os.getpid()))
+    if not os.path.exists(SESSION_DIR):
+        os.makedirs(SESSION_DIR)
+    return SESSION_DIR
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _job_log_dir():
+    '''
+    return the subdirectory of JOB_LOG_DIR for run scripts and logs
+    written today
+    '''
+    path = os.path.join(JOB_LOG_DIR,datetime.now().strftime('%Y%m%d'))
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _open_log_index():
+    '''
+    open the log index in JOB_LOG_DIR
+    '''
+    try:
+        from .logindex import LogIndex
+    except ImportError:
+        #-- run as a script
+        from logindex import LogIndex
+    return LogIndex(os.path.join(JOB_LOG_DIR,'log-index.sqlite'))
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _log_index_add(jid,script,log,cmd_line):
+    '''
+    record the run script and log of a job in the log index
+    '''
+    global _log_index
+    if not LOG_INDEX:
+        return
+    if _log_index is None:
+        _log_index = _open_log_index()
+    _log_index.add(jid,script,log,'; '.join(cmd_line))
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _peek_log(jid):
+    '''
+    return the log file of a job: from the log index, or by searching
+    JOB_LOG_DIR for jobs submitted without it
+    '''
+    if os.path.exists(os.path.join(JOB_LOG_DIR,'log-index.sqlite')):
+        entry = _open_log_index().lookup(jid)
+        if entry is not None:
+            return entry['log']
+
+    job_datetime='????????-??????'
+    random_str = '*'
+    name = '.'.join([JOB_FILE_PREFIX,job_datetime,random_str,jid,'out'])
+    jout = glob(os.path.join(JOB_LOG_DIR,name))+glob(os.path.join(JOB_LOG_DIR,'*',name))
+    jout.sort(key=os.path.basename)
+    if jout:
+        return jout[-1]
+    return None
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _sentinel_script_pre():
+    '''
+    return batch script lines recording the start of the job
+    '''
+    return ['TM_START=$(date +%s)']
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _sentinel_script_post(batch_script_file,array=None):
+    '''
+    return batch script lines that atomically write a completion record
+    (exit code, start/end time, host, peak memory of the job cgroup)
+    '''
+    record = os.path.join(_session_dir(),os.path.basename(batch_script_file))
+    if array:
+        record += '.${%s}'%ARRAY_INDEX_VAR
+    record += '.done'
+
+    return [
+        'TM_STATUS=${?}',
+        'TM_CGROUP=$(awk -F: \'$2 ~ /memory/ {print $3; exit} $1 == "0" {print $3; exit}\' /proc/self/cgroup 2>/dev/null)',
+        'TM_MAXRSS=',
+        'for f in /sys/fs/cgroup/memory${TM_CGROUP}/memory.max_usage_in_bytes /sys/fs/cgroup${TM_CGROUP}/memory.peak; do',
+        '  if [ -r $f ]; then TM_MAXRSS=$(cat $f); break; fi',
+        'done',
+        '{',
+        '  echo "exit_code=${TM_STATUS}"',
+        '  echo "start=${TM_START}"',
+        '  echo "end=$(date +%s)"',
+        '  echo "host=$(hostname)"',
+        '  echo "maxrss=${TM_MAXRSS}"',
+        '} > %s.tmp && mv %s.tmp %s'%(record,record,record),
+        'exit ${TM_STATUS}']
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _read_record(path):
+    '''
+    parse a completion record file into a dictionary
+    '''
+    record = {}
+    with open(path) as fid:
+        for line in fid:
+            if '=' not in line:
+                continue
+            key,val = line.strip().split('=',1)
+            try:
+                record[key] = int(val)
+            except ValueError:
+                record[key] = val
+    return record
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _sentinel_scan():
+    '''
+    read new completion records; the session directory is only listed
+    when its modification time has changed (or is recent)
+    '''
+    global _sentinel_scan_mtime
+
+    if SESSION_DIR is None or not os.path.exists(SESSION_DIR):
+        return
+
+    #-- allow for coarse timestamps on parallel file systems
+    mtime = os.stat(SESSION_DIR).st_mtime
+    if mtime == _sentinel_scan_mtime and time.time() - mtime > 2.:
+        return
+    _sentinel_scan_mtime = mtime
+
+    for f in os.listdir(SESSION_DIR):
+        if f.endswith('.done') and f not in _sentinel_records:
+            try:
+                _sentinel_records[f] = _read_record(os.path.join(SESSION_DIR,f))
+            except (IOError,OSError):
+                pass
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def job_records(jid):
+    '''
+    return the list of completion records of a job (one per array task),
+    or None if the job has not written all its records
+    '''
+    if jid not in _sentinel_jobs:
+        return None
+
+    name,array = _sentinel_jobs[jid]
+    if array:
+        names = ['%s.%d.done'%(name,i) for i in range(array)]
+    else:
+        names = [name+'.done']
+
+    if not all(f in _sentinel_records for f in names):
+        return None
+    return [_sentinel_records[f] for f in names]
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _sentinel_status(jid):
+    '''
+    return job status from completion records, or None if incomplete
+    '''
+    records = job_records(jid)
+    if records is None:
+        return None
+    elif all(r.get('exit_code') == 0 for r in records):
+        return _job_stat_done
+    else:
+        return _job_stat_fail
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def kill(jid):
+    '''
+    cancel a job or a list of jobs; lists are cancelled with one
+    scancel/qdel/bkill call per KILL_CHUNK job IDs
+    '''
+    _configure()
+    jid_list = [jid] if isinstance(jid,str) else list(jid)
+
+    #-- bundled commands are cancelled with their bundle job
+    members = [jid for jid in jid_list if jid in _bundle_members]
+    if members:
+        jid_list = [jid for jid in jid_list if jid not in _bundle_members]
+        jid_list += [jid for jid in _bundle_kill(members) if jid not in jid_list]
+
+    if Q_SYSTEM is None:
+        for jid in jid_list:
+            _os_kill(jid)
+        return
+
+    for i in range(0,len(jid_list),KILL_CHUNK):
+        if Q_SYSTEM == 'LSF':
+            call(['bkill']+jid_list[i:i+KILL_CHUNK])
+        elif Q_SYSTEM == 'SLURM':
+            call(['scancel']+jid_list[i:i+KILL_CHUNK])
+        elif Q_SYSTEM == 'PBS':
+            call(['qdel']+jid_list[i:i+KILL_CHUNK])
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _dependents(jid_list):
+    '''
+    return the active jobs that depend on any job in a list, directly or
+    through other jobs, following the dependencies recorded at submission
+    '''
+    dependents = {}
+    for jid,depjob in _job_depends.items():
+        for d in depjob:
+            dependents.setdefault(d,[]).append(jid)
+
+    found = []
+    seen = set(jid_list)
+    stack = list(jid_list)
+    while stack:
+        for jid in dependents.get(stack.pop(),[]):
+            if jid not in seen:
+                seen.add(jid)
+                found.append(jid)
+                stack.append(jid)
+
+    return [jid for jid in found if jid in JID]
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def job_dependencies(jid):
+    _configure()
+    if Q_SYSTEM is None:
+        if jid in _os_jobs:
+            return _os_jobs[jid]['depjob']
+        return []
+    elif Q_SYSTEM == 'LSF':
+        return []
+    elif Q_SYSTEM == 'SLURM':
+        return _slurm_job_dependencies(jid)
+    elif Q_SYSTEM == 'PBS':
+        return []
+
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _update_dependencies(jid,depjob):
+    '''
+    replace the dependencies of a queued job
+    '''
+    if Q_SYSTEM is None:
+        if jid in _os_jobs:
+            _os_jobs[jid]['depjob'] = list(depjob)
+    elif Q_SYSTEM == 'SLURM':
+        call(['scontrol','update','JobId='+jid,
+              'Dependency=afterok:'+':'.join(depjob)])
+    elif Q_SYSTEM == 'PBS':
+        call(['qalter','-W','depend=afterok:'+':'.join(depjob),jid])
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _fail_reasons(jid_list):
+    '''
+    return the failure reason (see RetryPolicy) by job ID for a list of
+    failed jobs, querying the queue system once; for job arrays, the
+    reason of the task that failed first in _fail_reason_order
+
+    the reason is None while the queue system has not yet reached a
+    final state for the job, e.g. when a completion record shows the
+    failure before sacct does
+    '''
+    reasons = dict((jid,None) for jid in jid_list)
+    unsettled = set()
+
+    if Q_SYSTEM == 'SLURM' and jid_list:
+        stdout,stderr = _scheduler_query(['sacct','--noheader',
+                                          '--parsable2','--allocations',
+                                          '--format=JobID,State'],jid_list)
+        for line in stdout.splitlines():
+            items = line.split('|')
+            if len(items) != 2 or not items[1]:
+                continue
+            jid = items[0].split('_')[0]
+            state = items[1].split()[0]
+            if state == 'COMPLETED' or jid not in reasons:
+                continue
+            if state not in _slurm_fail_reasons and state != 'FAILED':
+                unsettled.add(jid)
+                continue
+            reason = _slurm_fail_reasons.get(state,'FAILED')
+            if (reasons[jid] is None or _fail_reason_order.index(reason) <
+                _fail_reason_order.index(reasons[jid])):
+                reasons[jid] = reason
+
+    elif Q_SYSTEM == 'PBS' and jid_list:
+        for jid,status_dict in _pbs_show_job_bulk(jid_list).items():
+            if status_dict is not None:
+                reasons[jid] = _pbs_fail_reasons.get(
+                    int(status_dict.get('Exit_status','0')),'FAILED')
+
+    return dict((jid,None if jid in unsettled else reason or 'FAILED')
+                for jid,reason in reasons.items())
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _retry_schedule(jid_list):
+    '''
+    schedule the resubmission of the failed jobs that RETRY allows;
+    return the jobs whose failure reason is not yet known, to be
+    classified on a later pass
+    '''
+    jid_list = [jid for jid in jid_list if jid in _job_submit
+                and _job_submit[jid][2] < RETRY.max_attempts]
+    if not jid_list:
+        return []
+
+    reasons = _fail_reasons(jid_list)
+    for jid in jid_list:
+        if reasons[jid] is None:
+            continue
+        cmdi,kwargs,attempt = _job_submit[jid]
+        kwargs = RETRY.retry_kwargs(reasons[jid],kwargs,attempt)
+        if kwargs is None:
+            continue
+        delay = RETRY.delay(attempt)
+        _retry_pending[jid] = (time.time()+delay,kwargs)
+        report_status('%s failed (%s), resubmitting in %.0f s'%(
+            jid,reasons[jid],delay))
+
+    return [jid for jid in jid_list if reasons[jid] is None]
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _retry_submit(jid):
+    '''
+    resubmit a failed job and move the jobs depending on it to the
+    new job ID; return the new job ID
+    '''
+    global BUNDLE
+
+    #-- the failed job stays pending resubmission until its dependents
+    #-- are moved, so that local dispatch holds rather than cancels them
+    due,kwargs = _retry_pending[jid]
+    cmdi,kwargs_failed,attempt = _job_submit[jid]
+
+    if jid in JID:
+        JID.remove(jid)
+    BUNDLE,settings_active = None,BUNDLE
+    try:
+        jid_new = submit(cmdi,usage_class=_job_usage_class.pop(jid,''),**kwargs)
+    finally:
+        BUNDLE = settings_active
+
+    _job_submit[jid_new] = (cmdi,kwargs,attempt+1)
+    _retry_map[jid] = jid_new
+    report_status('%s resubmitted as %s (attempt %d)'%(jid,jid_new,attempt+1))
+
+    for jid_dep,depjob in _job_depends.items():
+        if jid in depjob and jid_dep in JID:
+            depjob[:] = [jid_new if d == jid else d for d in depjob]
+            _update_dependencies(jid_dep,[d for d in depjob if d in JID])
+
+    del _retry_pending[jid]
+    del _job_submit[jid]
+    return jid_new
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _retry_latest(jid):
+    '''
+    return the job ID of the latest resubmission of a job
+    '''
+    while jid in _retry_map:
+        jid = _retry_map[jid]
+    return jid
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _low_water(maxjobs):
+    '''
+    return the job count to drain to once maxjobs has been reached
+    '''
+    if MAXJOBS_LOW is None:
+        return max(maxjobs-1,0)
+    else:
+        return max(maxjobs-(MAXJOBS-MAXJOBS_LOW),0)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def bundle_start(size=20,window=None,workers=4,node_memory=None):
+    '''
+    start collecting submitted commands into bundles; each bundle runs as
+    one batch job in which the commands share a pool of worker processes
+
+    size : commands per bundle
+    window : submit a partial bundle after this many seconds
+    workers : number of commands running at once within a bundle job
+    node_memory : if set (e.g., "100GB"), split each bundle into bins whose
+                  summed memory requests fit in node_memory
+
+    submit() then returns a member ID for each command; member IDs can be
+    used with wait(), status() and as depjob (a dependency on a member is
+    a dependency on its whole bundle job). Commands are grouped by their
+    submit arguments, other than memory and depjob.
+    '''
+    global BUNDLE
+    BUNDLE = {'size': size,
+              'window': window,
+              'workers': workers,
+              'node_memory': node_memory}
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def bundle_stop():
+    '''
+    submit pending bundles and stop bundling
+    '''
+    global BUNDLE
+    bundle_flush()
+    BUNDLE = None
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def bundle_flush():
+    '''
+    submit all pending bundles
+    '''
+    _configure()
+    for key in list(_bundle_pending.keys()):
+        _bundle_flush_group(key)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _bundle_add(cmdi,kwargs):
+    '''
+    add a command to the pending bundle for its submit arguments;
+    return its member ID
+    '''
+    global _bundle_count
+
+    kwargs = dict(kwargs)
+    depjob = kwargs.pop('depjob',None) or []
+    if isinstance(depjob,str):
+        depjob = [depjob]
+    memory = kwargs.pop('memory',None)
+
+    #-- commands depending on a pending command go to a later bundle
+    if any(d in _bundle_members and _bundle_members[d]['jid'] is None
+           for d in depjob):
+        depjob = _bundle_resolve(depjob)
+
+    key = json.dumps(kwargs,sort_keys=True,default=str)
+    if key not in _bundle_pending:
+        _bundle_count += 1
+        _bundle_pending[key] = {'tag': 'bundle%d'%_bundle_count,
+                                'kwargs': kwargs,
+                                'members': [],
+                                'time': time.time()}
+    group = _bundle_pending[key]
+
+    mid = '%s.%d'%(group['tag'],len(group['members']))
+    group['members'].append({'id': mid,
+                             'command': cmdi,
+                             'memory': memory,
+                             'depjob': depjob})
+    _bundle_members[mid] = {'jid': None, 'record': None}
+
+    #-- submit full bundles and those older than the window
+    if len(group['members']) >= BUNDLE['size']:
+        _bundle_flush_group(key)
+    if BUNDLE['window'] is not None:
+        for k in list(_bundle_pending.keys()):
+            if time.time() - _bundle_pending[k]['time'] >= BUNDLE['window']:
+                _bundle_flush_group(k)
+
+    return mid
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _bundle_kill(members):
+    '''
+    cancel bundled commands: those not yet submitted are dropped from
+    their bundle; return the bundle jobs of the others, to be cancelled
+    with all their commands
+    '''
+    jid_list = []
+    for mid in members:
+        member = _bundle_members[mid]
+        if member['jid'] is None:
+            member['cancelled'] = True
+        elif member['jid'] not in jid_list:
+            jid_list.append(member['jid'])
+    return jid_list
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _bundle_resolve(depjob):
+    '''
+    map member IDs in a dependency list to their bundle job IDs,
+    submitting pending bundles as needed
+    '''
+    if isinstance(depjob,str):
+        depjob = [depjob]
+
+    for d in depjob:
+        if d in _bundle_members and _bundle_members[d]['jid'] is None:
+            for key,group in list(_bundle_pending.items()):
+                if d in [m['id'] for m in group['members']]:
+                    _bundle_flush_group(key)
+
+    depjob_out = []
+    for d in depjob:
+        if d in _bundle_members:
+            d = _bundle_members[d]['jid']
+        if d not in depjob_out:
+            depjob_out.append(d)
+    return depjob_out
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _bundle_pack(members,node_memory):
+    '''
+    split members into bins whose memory requests fit in node_memory
+    (first-fit decreasing); members without a request take no space
+    '''
+    if node_memory is None:
+        return [members]
+
+    capacity = parse_memory(node_memory)
+    size = lambda m: parse_memory(m['memory']) if m['memory'] else 0
+
+    bins = []
+    for member in sorted(members,key=size,reverse=True):
+        for b in bins:
+            if sum(size(m) for m in b) + size(member) <= capacity:
+                b.append(member)
+                break
+        else:
+            bins.append([member])
+    return bins
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _bundle_flush_group(key):
+    '''
+    submit the pending bundle for a set of submit arguments
+    '''
+    global BUNDLE
+
+    group = _bundle_pending.pop(key)
+    settings = BUNDLE or {'workers': 4, 'node_memory': None}
+
+    #-- commands cancelled before submission are left out
+    pending = [m for m in group['members']
+               if not _bundle_members[m['id']].get('cancelled')]
+    if not pending:
+        return
+
+    for members in _bundle_pack(pending,settings['node_memory']):
+
+        workers = min(settings['workers'],len(members))
+
+        #-- write manifest of commands and their completion records
+        job_datetime = datetime.now().strftime('%Y%m%d-%H%M%S')
+        fid,manifest_file = tempfile.mkstemp(dir=_job_log_dir(),
+                                             prefix=JOB_FILE_PREFIX+'.'+job_datetime+'.',
+                                             suffix='.bundle')
+        os.close(fid)
+
+        commands = []
+        records = []
+        for i,member in enumerate(members):
+            if isinstance(member['command'][0],list):
+                commands.append('set -e; '+'; '.join([' '.join(cmd) for cmd in member['command']]))
+            else:
+                commands.append(' '.join(member['command']))
+            records.append(os.path.basename(manifest_file)+'.%d.done'%i)
+
+        with open(manifest_file,'w') as fid:
+            json.dump({'commands': commands,
+                       'records': [os.path.join(_session_dir(),r) for r in records],
+                       'workers': workers},fid)
+
+        #-- bundle job: memory for the largest concurrent commands,
+        #-- dependencies of all commands
+        kwargs = dict(group['kwargs'])
+        memory = sorted([parse_memory(m['memory']) for m in members if m['memory']],
+                        reverse=True)
+        if memory:
+            kwargs['memory'] = format_memory(sum(memory[:workers]))
+
+        depjob = []
+        for member in members:
+            depjob.extend(d for d in member['depjob'] if d not in depjob)
+        if depjob:
+            kwargs['depjob'] = depjob
+        if workers > 1 and Q_SYSTEM is not None:
+            kwargs['ncpus'] = workers
+
+        python = sys.executable if Q_SYSTEM is None else 'python'
+
+        BUNDLE,settings_active = None,BUNDLE
+        try:
+            jid = submit([python,'-m','workflow.bundle',manifest_file],
+                         usage_class='',**kwargs)
+        finally:
+            BUNDLE = settings_active
+
+        #-- a rerun would overwrite the records of completed members
+        _job_submit.pop(jid,None)
+
+        for member,record in zip(members,records):
+            _bundle_members[member['id']] = {'jid': jid, 'record': record}
+
+        report_status('%s: bundle of %d commands'%(jid,len(members)))
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _usage_class(cmdi,input_size=None):
+    '''
+    return the task class of a command for the usage history: the name
+    of the script, and the input size (bytes) to the nearest power of 2;
+    for interpreters (python, bash, ...), the name of the script or module
+    they run
+    '''
+    command = cmdi[0] if isinstance(cmdi[0],list) else cmdi
+    args = list(command)
+    usage_class = os.path.basename(args[0])
+    while (usage_class.rstrip('0123456789.') in _usage_interpreters
+           and len(args) > 1):
+        #-- skip interpreter options and environment settings
+        args = args[1:]
+        while args and (args[0].startswith('-') or '=' in args[0]):
+            if args[0] in ['-m','-c'] and len(args) > 1:
+                args = [args[1].split()[0]]
+                break
+            args = args[1:]
+        if not args:
+            break
+        usage_class = os.path.basename(args[0])
+    if input_size:
+        usage_class += ':2^%d'%int(round(math.log(input_size,2)))
+    return usage_class
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _open_usage_history():
+    '''
+    open the usage history in JOB_LOG_DIR
+    '''
+    global _usage_history
+    if _usage_history is None:
+        try:
+            from .usage import UsageHistory
+        except ImportError:
+            #-- run as a script
+            from usage import UsageHistory
+        _usage_history = UsageHistory(os.path.join(JOB_LOG_DIR,'usage.sqlite'))
+    return _usage_history
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _usage_request(usage_class,kwargs):
+    '''
+    replace memory='auto' and time_limit='auto' in submit arguments with
+    a percentile of the usage history plus a margin; without enough
+    history, the defaults of the queue system backend apply
+    '''
+    auto = [key for key in ['memory','time_limit'] if kwargs.get(key) == 'auto']
+    if not auto:
+        return
+
+    for key in auto:
+        column,margin = {'memory': ('maxrss',USAGE_MEMORY_MARGIN),
+                         'time_limit': ('elapsed',USAGE_TIME_MARGIN)}[key]
+        value = None
+        if usage_class:
+            value = _open_usage_history().percentile(usage_class,column,
+                                                     USAGE_PERCENTILE,
+                                                     USAGE_MIN_SAMPLES)
+        if value is None:
+            del kwargs[key]
+            report_status('%s: no usage history, default %s'%(usage_class,key))
+        elif key == 'memory':
+            kwargs[key] = format_memory(int(value*margin))
+        else:
+            kwargs[key] = _format_time_limit(max(value*margin,USAGE_MIN_TIME))
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _record_usage(jid_list):
+    '''
+    add the peak memory and run time of finished jobs to the usage
+    history, from their completion records or else the queue system;
+    for job arrays, the largest over tasks
+    '''
+    usage = {}
+    query_list = []
+    for jid in jid_list:
+        records = job_records(jid)
+        if records and all(isinstance(r.get('maxrss'),int) for r in records):
+            usage[jid] = (max(r['maxrss'] for r in records),
+                          max(r['end']-r['start'] for r in records))
+        else:
+            query_list.append(jid)
+
+    if query_list and Q_SYSTEM == 'SLURM':
+        usage.update(_slurm_usage_bulk(query_list))
+    elif query_list and Q_SYSTEM == 'PBS':
+        usage.update(_pbs_usage_bulk(query_list))
+
+    rows = [(_job_usage_class[jid],jid,maxrss,elapsed)
+            for jid,(maxrss,elapsed) in usage.items()
+            if jid in _job_usage_class]
+    _open_usage_history().add(rows)
+
+    for jid in jid_list:
+        _job_usage_class.pop(jid,None)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _slurm_usage_bulk(jid_list):
+    '''
+    return peak memory (bytes) and elapsed time (seconds) of finished
+    jobs by job ID from a single sacct query
+    '''
+    stdout,stderr = _scheduler_query(['sacct','--noheader','--parsable2',
+                                      '--format=JobID,MaxRSS,ElapsedRaw'],
+                                     jid_list)
+    usage = {}
+    for line in stdout.splitlines():
+        fields = line.split('|')
+        if len(fields) < 3:
+            continue
+        jid = fields[0].split('.')[0].split('_')[0]
+        try:
+            maxrss = parse_memory(fields[1]) if fields[1] else 0
+            elapsed = int(fields[2]) if fields[2] else 0
+        except ValueError:
+            continue
+        maxrss_jid,elapsed_jid = usage.get(jid,(0,0))
+        usage[jid] = (max(maxrss,maxrss_jid),max(elapsed,elapsed_jid))
+
+    #-- jobs without a memory measurement are left out
+    return dict((jid,val) for jid,val in usage.items()
+                if jid in jid_list and val[0] > 0)
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _pbs_usage_bulk(jid_list):
+    '''
+    return peak memory (bytes) and elapsed time (seconds) of finished
+    jobs by job ID from a single qstat query
+    '''
+    usage = {}
+    for jid,status_dict in _pbs_show_job_bulk(jid_list).items():
+        if not status_dict or 'resources_used.mem' not in status_dict:
+            continue
+        try:
+            maxrss = parse_memory(status_dict['resources_used.mem'])
+            elapsed = _time_limit_seconds(status_dict.get('resources_used.walltime','0'))
+        except ValueError:
+            continue
+        usage[jid] = (maxrss,elapsed)
+    return usage
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def open_journal(path=None):
+    '''
+    record submissions in an on-disk journal (default: JOB_LOG_DIR/journal.sqlite);
+    submit() then skips tasks completed by a previous driver run and
+    reattaches to tasks that are still queued
+
+    tasks are matched by command and submit arguments (journal.task_key);
+    commands naming temporary files, such as the argument manifests and
+    file lists written by chunktime, differ between runs and are always
+    resubmitted (chunktime.apply skips chunks whose output exists)
+    '''
+    global JOURNAL,SESSION_DIR
+    from .journal import Journal
+    _configure()
+
+    if path is None:
+        path = os.path.join(JOB_LOG_DIR,'journal.sqlite')
+    JOURNAL = Journal(path)
+
+    #-- keep completion records next to the journal to outlive the driver
+    if SESSION_DIR is None:
+        SESSION_DIR = path+'.records'
+
+    #-- refresh the state of jobs left active by the previous run
+    active_states = [_job_stat_pend,_job_stat_run,_job_stat_recheck]
+    entries = JOURNAL.active(active_states)
+    for entry in entries:
+        if entry['record'] is not None:
+            _sentinel_jobs[entry['jid']] = (entry['record'],entry['ntask'])
+
+    stat_out = status_list([entry['jid'] for entry in entries])
+    for jid,stat_jid in stat_out.items():
+        #-- gone without a completion record: rerun
+        if stat_jid is None:
+            stat_out[jid] = _job_stat_fail if SENTINEL else _job_stat_done
+    JOURNAL.update(dict((entry['key'],stat_out[entry['jid']])
+                        for entry in entries),
+                   [_job_stat_done,_job_stat_fail])
+
+    report_status('journal %s: %d jobs still active'%(
+        path,len([s for s in stat_out.values() if s in active_states])))
+    return JOURNAL
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def submit(cmdi,**kwargs):
+    _configure()
+
+    if Q_SYSTEM is not None and (kwargs.get('array') or 0) > MAX_ARRAY_SIZE:
+        print('Job array of %d tasks exceeds MAX_ARRAY_SIZE (%d)'%(
+            kwargs['array'],MAX_ARRAY_SIZE))
+        raise ValueError('Job array too large')
+
+    #-- size memory and time requests from the usage history
+    usage_class = kwargs.pop('usage_class',None)
+    if usage_class is None:
+        usage_class = _usage_class(cmdi,kwargs.pop('input_size',None))
+    kwargs.pop('input_size',None)
+    _usage_request(usage_class,kwargs)
+
+    #-- collect into a bundle
+    if BUNDLE is not None:
+        return _bundle_add(cmdi,kwargs)
+
+    #-- dependencies on bundled commands are on their bundle jobs
+    if _bundle_members and kwargs.get('depjob'):
+        kwargs['depjob'] = _bundle_resolve(kwargs['depjob'])
+
+    #-- skip tasks completed in a previous run; reattach to queued ones
+    if JOURNAL is not None:
+        from .journal import task_key
+        key = task_key(cmdi,kwargs)
+        entry = JOURNAL.lookup(key)
+        if entry is not None and entry['state'] == _job_stat_done:
+            report_status('%s done in a previous run'%entry['jid'])
+            return entry['jid']
+        elif entry is not None and entry['state'] != _job_stat_fail:
+            if entry['jid'] not in JID:
+                JID.append(entry['jid'])
+            _journal_keys[entry['jid']] = key
+            report_status('%s reattached'%entry['jid'])
+            return entry['jid']
+
+    #-- if number of jobs is at max, wait for the queue to drain
+    #-- to the low-water mark
+    if len(JID) >= MAXJOBS:
+        print('Job count at threshold.')
+        ok = wait(JID,njob_target=_low_water(MAXJOBS))
+        stop_program(ok)
+
+    #-- same for partition limits; jobs without a partition go to the
+    #-- backend's default
+    partition = kwargs.get('partition') or DEFAULT_PARTITION.get(Q_SYSTEM)
+    if partition in MAXJOBS_PARTITION:
+        jid_partition = [jid for jid in JID if _job_partition.get(jid) == partition]
+        if len(jid_partition) >= MAXJOBS_PARTITION[partition]:
+            print('Job count at threshold for partition %s.'%partition)
+            ok = wait(jid_partition,
+                      njob_target=_low_water(MAXJOBS_PARTITION[partition]))
+            stop_program(ok)
 
-    stat_out = None
+    if Q_SYSTEM is None:
+        jid,ok,stop = _os_call(cmdi,**kwargs)
+    elif Q_SYSTEM == 'LSF':
+        jid,ok,stop = _bsub(cmdi,**kwargs)
+    elif Q_SYSTEM == 'SLURM':
+        jid,ok,stop = _slurm_batch_submit(cmdi,**kwargs)
+    elif Q_SYSTEM == 'PBS':
+        jid,ok,stop = _qsub(cmdi,**kwargs)
+
+    if 'time_limit' in kwargs:
+        _job_time_limit[jid] = _time_limit_seconds(kwargs['time_limit'])
+    _job_partition[jid] = partition
+    if USAGE and usage_class:
+        _job_usage_class[jid] = usage_class
+    if kwargs.get('depjob'):
+        depjob = kwargs['depjob']
+        _job_depends[jid] = [depjob] if isinstance(depjob,str) else list(depjob)
+    if RETRY is not None:
+        _job_submit[jid] = (cmdi,dict(kwargs),1)
+
+    if JOURNAL is not None:
+        record,ntask = _sentinel_jobs.get(jid,(None,None))
+        JOURNAL.add(key,jid,cmdi,kwargs,_job_stat_pend,
+                    depjob=kwargs.get('depjob'),record=record,ntask=ntask)
+        _journal_keys[jid] = key
+
+    stop_program(ok,stop)
+    return jid
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def wait(job_wait_list=[],njob_target=0,closeout=False,poll=None):
+    '''
+    wait on jobs; poll sets the interval between status queries and may
+    be a PollPolicy or a fixed number of seconds (default: PollPolicy())
+    '''
+    _configure()
+    if _bundle_pending:
+        bundle_flush()
+    ok,stop = _wait_on_jobs(job_wait_list,njob_target,poll)
+    if not closeout:
+        stop_program(ok,stop)
+    return ok
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def status(jid):
+    _configure()
+
+    #-- bundled commands: from their records or their bundle job
+    if jid in _bundle_members:
+        return status_list([jid])[jid]
+
+    stat_out = None
     if Q_SYSTEM is None:
         stat_out = _os_status(jid)
     elif Q_SYSTEM == 'LSF':
@@ -1031,6 +2602,132 @@ def status(jid):
 
     return stat_out
 
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _status_query(job_status_bulk,jid_list):
+    '''
+    query the queue system for a list of jobs; while completion records
+    are in use, reuse the last answer for at most SENTINEL_QUERY_INTERVAL
+    seconds unless a job has not been queried before
+    '''
+    global _status_cache_time
+
+    if (SENTINEL and time.time() - _status_cache_time < SENTINEL_QUERY_INTERVAL
+        and all(jid in _status_cache for jid in jid_list)):
+        return dict((jid,_status_cache[jid]) for jid in jid_list)
+
+    stat_out = job_status_bulk(jid_list)
+    _status_cache.update(stat_out)
+    _status_cache_time = time.time()
+    return stat_out
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def status_list(jid_list):
+    '''
+    return a dictionary of job status for a list of job IDs;
+    the queue system is queried once for all jobs rather than once per job
+    '''
+    _configure()
+
+    members = [jid for jid in jid_list if jid in _bundle_members]
+    if not members:
+        return _job_status_list(jid_list)
+
+    #-- bundled commands: status from their records, or from the bundle job
+    _sentinel_scan()
+    stat_out = {}
+    bundle_jobs = []
+    for mid in members:
+        member = _bundle_members[mid]
+        if member.get('cancelled'):
+            stat_out[mid] = _job_stat_fail
+        elif member['jid'] is None:
+            stat_out[mid] = _job_stat_pend
+        elif member['record'] in _sentinel_records:
+            if _sentinel_records[member['record']].get('exit_code') == 0:
+                stat_out[mid] = _job_stat_done
+            else:
+                stat_out[mid] = _job_stat_fail
+        elif member['jid'] not in bundle_jobs:
+            bundle_jobs.append(member['jid'])
+
+    stat_jobs = _job_status_list(
+        [jid for jid in jid_list if jid not in _bundle_members]+bundle_jobs)
+
+    for mid in members:
+        if mid in stat_out:
+            continue
+        stat_bundle = stat_jobs[_bundle_members[mid]['jid']]
+        if stat_bundle in [_job_stat_pend,_job_stat_run,_job_stat_recheck]:
+            stat_out[mid] = stat_bundle
+        else:
+            #-- bundle job ended without a record for this command
+            stat_out[mid] = _job_stat_fail
+
+    for jid in jid_list:
+        if jid not in _bundle_members:
+            stat_out[jid] = stat_jobs[jid]
+    return stat_out
+
+#----------------------------------------------------------------
+#---- function
+#----------------------------------------------------------------
+
+def _job_status_list(jid_list):
+    '''
+    return a dictionary of job status for a list of batch job IDs
+    '''
+
+    stat_out = {}
+    if Q_SYSTEM is None:
+        _os_dispatch()
+        stat_out = dict((jid,_os_job_state(jid)) for jid in jid_list)
+    elif Q_SYSTEM == 'LSF':
+        stat_out = dict((jid,_bstat(jid)) for jid in jid_list)
+    elif Q_SYSTEM in ['SLURM','PBS']:
+        if Q_SYSTEM == 'SLURM':
+            job_status_bulk = _slurm_job_status_bulk
+        else:
+            job_status_bulk = _pbs_job_status_bulk
+
+        #-- completed jobs are found from their records
+        query_list = jid_list
+        if SENTINEL:
+            _sentinel_scan()
+            for jid in jid_list:
+                stat_out[jid] = _sentinel_status(jid)
+            query_list = [jid for jid in jid_list if stat_out[jid] is None]
+
+        stat_out.update(_status_query(job_status_bulk,query_list))
+
+        #-- recheck jobs in transition, all at once
+        i = 0
+        recheck = [jid for jid,s in stat_out.items() if s == _job_stat_recheck]
+        while recheck and i < 100:
+            time.sleep(0.5)
+            stat_out.update(job_status_bulk(recheck))
+            recheck = [jid for jid in recheck if stat_out[jid] == _job_stat_recheck]
+            i += 1
+
+        for jid in recheck:
+            stat_out[jid] = _job_stat_fail
+
+        #-- gone from the queue system without a completion record:
+        #-- killed before the batch script could write it
+        if SENTINEL:
+            for jid in query_list:
+                if stat_out[jid] is None and jid in _sentinel_jobs:
+                    stat_out[jid] = _job_stat_fail
+
+        _status_cache.update((jid,stat_out[jid]) for jid in query_list)
+
+    return stat_out
+
 #----------------------------------------------------------------
 #---- FUNCTION
 #----------------------------------------------------------------
@@ -1063,6 +2760,7 @@ if __name__ == "__main__":
 
     task = sys.argv[1]
     args = sys.argv[2:]
+    _configure()
 
     if task == "submit":
         jid = submit(args,email=True)
@@ -1074,22 +2772,26 @@ if __name__ == "__main__":
         wait(args)
 
     elif task == "peek":
-
-        job_datetime='????????-??????'
-        random_str = '*'
-        stdoe = os.path.join(JOB_LOG_DIR,'.'.join([JOB_FILE_PREFIX,job_datetime,random_str,args[0],'out']))
-        print(stdoe)
-        jout = glob(stdoe)
-        jout.sort()
-        if jout:
+        #-- peek jid [-f]: page through the log of a job, or follow it
+        log = _peek_log(args[0])
+        if log is None:
+            print(args[0]+' not found.')
+        elif '-f' in args[1:]:
+            print(log)
+            try:
+                call(['tail','-n','+1','-F',log])
+            except KeyboardInterrupt:
+                pass
+        elif not os.path.exists(log):
+            print(log+' not found.')
+        else:
+            print(log)
             try:
-                call(['less',jout[-1]])
+                call(['less',log])
             except:
                 call(['reset'])
                 call(['clear'])
                 exit()
-        else:
-            print(args[0]+' not found.')
 
     else:
         print(task+' not found.')
@@ -0,0 +1,137 @@
+import heapq
+from collections import OrderedDict
+
+from . import task_manager as tm
+
+#------------------------------------------------------------
+#-- class
+#------------------------------------------------------------
+
+class TaskGraph(object):
+    '''declarative graph of tasks submitted through task_manager
+
+    Tasks and their dependencies are declared up front with `add`;
+    `submit` then sends them to the queue in topological order, highest
+    priority first, where the priority of a task is the length of the
+    longest path from it to the end of the graph (critical path first).
+    Each task carries an afterok dependency on its inputs, so the queue
+    system releases it as soon as they finish; task_manager.submit keeps
+    the number of queued jobs within MAXJOBS.
+
+    Example
+    -------
+
+    g = TaskGraph()
+    g.add('a', ['compute_a.py'], cost=3600)
+    g.add('b', ['compute_b.py'], cost=600)
+    g.add('plot', ['plot.py'], deps=['a','b'])
+    ok = g.run()
+    '''
+
+    def __init__(self):
+        self.tasks = OrderedDict()
+        self.jid = {}
+
+    def add(self,name,command,deps=[],cost=None,**submit_kwargs):
+        '''declare a task
+
+        Parameters
+        ----------
+
+        name : str
+          unique name of the task
+        command : list
+          command passed to task_manager.submit
+        deps : list, optional
+          names of tasks that must complete first
+        cost : float, optional
+          expected run time (seconds); default is the requested
+          time_limit, or 1
+        submit_kwargs : dict, optional
+          keyword arguments to task_manager.submit
+        '''
+        if name in self.tasks:
+            raise ValueError('Duplicate task: %s'%name)
+
+        if cost is None:
+            if 'time_limit' in submit_kwargs:
+                cost = tm._time_limit_seconds(submit_kwargs['time_limit'])
+            else:
+                cost = 1.
+
+        self.tasks[name] = {'command': command,
+                            'deps': list(deps),
+                            'cost': float(cost),
+                            'kwargs': submit_kwargs}
+        return name
+
+    def _children(self):
+        children = dict((name,[]) for name in self.tasks)
+        for name,task in self.tasks.items():
+            for dep in task['deps']:
+                if dep not in self.tasks:
+                    raise ValueError('Task %s depends on unknown task %s'%(name,dep))
+                children[dep].append(name)
+        return children
+
+    def critical_path(self):
+        '''return the length of the longest path from each task to the end
+        of the graph, including the task itself'''
+
+        children = self._children()
+
+        #-- reverse topological order: tasks without children first
+        nchild = dict((name,len(c)) for name,c in children.items())
+        ready = [name for name,n in nchild.items() if n == 0]
+        rank = {}
+        while ready:
+            name = ready.pop()
+            rank[name] = self.tasks[name]['cost'] + max(
+                [rank[c] for c in children[name]] or [0.])
+            for dep in self.tasks[name]['deps']:
+                nchild[dep] -= 1
+                if nchild[dep] == 0:
+                    ready.append(dep)
+
+        if len(rank) != len(self.tasks):
+            raise ValueError('Task graph contains a cycle')
+        return rank
+
+    def submit(self):
+        '''submit all tasks; return a dictionary of job IDs by task name'''
+
+        children = self._children()
+        rank = self.critical_path()
+
+        #-- tasks become ready once all their inputs have been submitted
+        ndep = dict((name,len(task['deps'])) for name,task in self.tasks.items())
+        order = dict((name,i) for i,name in enumerate(self.tasks))
+        ready = [(-rank[name],order[name],name)
+                 for name,n in ndep.items() if n == 0]
+        heapq.heapify(ready)
+
+        while ready:
+            _,_,name = heapq.heappop(ready)
+            task = self.tasks[name]
+
+            kwargs = dict(task['kwargs'])
+            depjob = kwargs.pop('depjob',[])
+            if isinstance(depjob,str):
+                depjob = [depjob]
+            depjob = depjob + [self.jid[dep] for dep in task['deps']]
+            if depjob:
+                kwargs['depjob'] = depjob
+
+            self.jid[name] = tm.submit(task['command'],**kwargs)
+
+            for child in children[name]:
+                ndep[child] -= 1
+                if ndep[child] == 0:
+                    heapq.heappush(ready,(-rank[child],order[child],child))
+
+        return self.jid
+
+    def run(self,**wait_kwargs):
+        '''submit all tasks and wait on them; return True on success'''
+        self.submit()
+        return tm.wait(list(self.jid.values()),**wait_kwargs)
@@ -0,0 +1,182 @@
+#! /usr/bin/env python
+'''
+throughput benchmark of task_manager against the fake scheduler
+
+usage:
+  bench.task_manager.py [-q SLURM|PBS] [-l latency] [-d duration]
+                        [--depend K] [N ...]
+
+for each job count N (default: 10 1000 10000) report
+  - submit rate (jobs/s) and driver CPU per submitted job
+  - cost of one status pass over all jobs (seconds and scheduler calls)
+  - delay from the end of the last job to the return of wait()
+  - driver and scheduler-tool CPU used while waiting
+
+a background thread writes the completion records of finished jobs,
+standing in for the batch scripts (disable with --no-sentinel); every
+K-th job depends on the job before it (default 10, 0 for none), so that
+waiting covers held jobs
+'''
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__)))
+import fake_scheduler
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+@contextmanager
+def quiet():
+    '''silence task_manager's per-job reporting'''
+    stdout = sys.stdout
+    with open(os.devnull,'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def ncalls(state_dir):
+    '''number of scheduler commands run so far'''
+    try:
+        with open(os.path.join(state_dir,'calls.log')) as fid:
+            return len(fid.readlines())
+    except IOError:
+        return 0
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def cpu_times():
+    t = os.times()
+    return t[0]+t[1], t[2]+t[3]
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def bench(tm,njob,workdir,depend=0):
+    '''submit and wait on njob jobs; return a dictionary of metrics'''
+
+    state_dir = os.path.join(workdir,'state.%d'%njob)
+    os.makedirs(state_dir)
+    os.environ['FAKE_SCHED_DIR'] = state_dir
+
+    del tm.JID[:]
+    tm.MAXJOBS = njob+1
+
+    #-- submit
+    cpu0,child0 = cpu_times()
+    t0 = time.time()
+    with quiet():
+        jid = None
+        for i in range(njob):
+            if depend and i%depend == depend-1:
+                jid = tm.submit(['true'],time_limit='01:00:00',depjob=jid)
+            else:
+                jid = tm.submit(['true'],time_limit='01:00:00')
+    t_submit = time.time() - t0
+    cpu_submit = cpu_times()[0] - cpu0
+
+    #-- one status pass over all jobs
+    n0 = ncalls(state_dir)
+    t0 = time.time()
+    tm.status_list(list(tm.JID))
+    t_poll = time.time() - t0
+    n_poll = ncalls(state_dir) - n0
+
+    #-- play the part of the batch scripts writing completion records
+    done = threading.Event()
+    def _records():
+        while not done.wait(0.1):
+            fake_scheduler.write_records(tm._session_dir(),state_dir)
+    if tm.SENTINEL:
+        threading.Thread(target=_records).start()
+
+    #-- wait on completion
+    cpu0,child0 = cpu_times()
+    n0 = ncalls(state_dir)
+    with quiet():
+        ok = tm.wait(closeout=True)
+    t_return = time.time()
+    cpu1,child1 = cpu_times()
+    done.set()
+
+    end_times = fake_scheduler.job_end_times(state_dir)
+    t_end = max(t for t in end_times.values() if t is not None)
+
+    return {'njob': njob,
+            'ok': ok,
+            'submit_rate': njob/t_submit,
+            'submit_cpu_ms': 1e3*cpu_submit/njob,
+            'poll_s': t_poll,
+            'poll_calls': n_poll,
+            'detect_s': t_return - t_end,
+            'wait_calls': ncalls(state_dir) - n0,
+            'wait_cpu_s': cpu1 - cpu0,
+            'wait_child_cpu_s': child1 - child0}
+
+#------------------------------------------------------------
+#-- main
+#------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    p = argparse.ArgumentParser(description='task_manager benchmark')
+    p.add_argument('njob',nargs='*',type=int,default=[10,1000,10000])
+    p.add_argument('-q',dest='queue',default='SLURM',choices=['SLURM','PBS'])
+    p.add_argument('-l',dest='latency',default='0',
+                   help='seconds added to every scheduler command')
+    p.add_argument('-d',dest='duration',default='1',
+                   help='job run time in seconds, "t" or "tmin:tmax"')
+    p.add_argument('--fail-rate',dest='fail_rate',default='0')
+    p.add_argument('--depend',dest='depend',type=int,default=10,
+                   help='every K-th job depends on the one before')
+    p.add_argument('--no-sentinel',dest='sentinel',action='store_false',
+                   help='detect completion from the scheduler only')
+    args = p.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench.task_manager.')
+    fake_scheduler.install(os.path.join(workdir,'bin'))
+
+    os.environ['PATH'] = os.path.join(workdir,'bin')+os.pathsep+os.environ['PATH']
+    os.environ['FAKE_SCHED_LATENCY'] = args.latency
+    os.environ['FAKE_SCHED_DURATION'] = args.duration
+    os.environ['FAKE_SCHED_FAIL_RATE'] = args.fail_rate
+    os.environ.setdefault('TERM','dumb')
+
+    from workflow import task_manager as tm
+    tm.Q_SYSTEM = args.queue
+    tm.JOB_LOG_DIR = os.path.join(workdir,'log')
+    tm.TMPDIR = os.path.join(workdir,'tmp')
+    tm.QUEUE_MAX_HOURS = 1e6
+    tm.SENTINEL = args.sentinel
+    os.makedirs(tm.JOB_LOG_DIR)
+    os.makedirs(tm.TMPDIR)
+
+    columns = ['njob','ok','submit_rate','submit_cpu_ms','poll_s','poll_calls',
+               'detect_s','wait_calls','wait_cpu_s','wait_child_cpu_s']
+    print(' '.join('%16s'%c for c in columns))
+    try:
+        for njob in args.njob:
+            result = bench(tm,njob,workdir,args.depend)
+            print(' '.join('%16.4g'%result[c] if isinstance(result[c],float)
+                           else '%16s'%result[c] for c in columns))
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,63 @@
+import os
+import sys
+import signal
+import importlib
+
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__)))
+import fake_scheduler
+
+#-- seconds a test driving the fake scheduler may take; a wait() that
+#-- never returns fails the test instead of hanging the suite
+TIMEOUT = 60
+
+#------------------------------------------------------------
+#-- fixture
+#------------------------------------------------------------
+
+@pytest.fixture
+def fake_sched(tmp_path,monkeypatch):
+    '''the fake scheduler tools on PATH; returns their state directory'''
+    bindir = str(tmp_path/'bin')
+    state_dir = str(tmp_path/'state')
+    os.makedirs(state_dir)
+    fake_scheduler.install(bindir)
+
+    monkeypatch.setenv('PATH',bindir+os.pathsep+os.environ['PATH'])
+    monkeypatch.setenv('FAKE_SCHED_DIR',state_dir)
+    monkeypatch.setenv('FAKE_SCHED_DURATION','0.2')
+    monkeypatch.setenv('USER','tester')
+    monkeypatch.setenv('TERM','dumb')
+    for name in ['FAKE_SCHED_FAIL_RATE','FAKE_SCHED_FAIL_MATCH',
+                 'FAKE_SCHED_MEMORY_NEED','TASK_MANAGER_CONFIG']:
+        monkeypatch.delenv(name,raising=False)
+    return state_dir
+
+#------------------------------------------------------------
+#-- fixture
+#------------------------------------------------------------
+
+@pytest.fixture
+def tm(tmp_path,fake_sched):
+    '''a freshly loaded task_manager driving the fake SLURM tools'''
+    from workflow import task_manager
+    importlib.reload(task_manager)
+
+    task_manager.Q_SYSTEM = 'SLURM'
+    task_manager.SCRATCH = str(tmp_path)
+    task_manager.JOB_LOG_DIR = str(tmp_path/'log')
+    task_manager.TMPDIR = str(tmp_path/'tmp')
+    task_manager.ACCOUNT = 'TEST0001'
+    task_manager.USER_MAIL = ''
+    task_manager.QUEUE_MAX_HOURS = 1e6
+    task_manager.SENTINEL = False
+    task_manager.USAGE = False
+
+    def _timeout(signum,frame):
+        raise RuntimeError('test did not finish in %d s'%TIMEOUT)
+    handler = signal.signal(signal.SIGALRM,_timeout)
+    signal.alarm(TIMEOUT)
+    yield task_manager
+    signal.alarm(0)
+    signal.signal(signal.SIGALRM,handler)
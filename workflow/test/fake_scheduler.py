@@ -0,0 +1,570 @@
+#! /usr/bin/env python
+'''
+stand-in for the SLURM and PBS command line tools used by task_manager
+
+A single script plays the part of sbatch, squeue, scontrol, scancel,
+sacct, qsub, qstat, qdel and qalter, depending on the name it is invoked
+under. Use `install(bindir)` to create the links and put `bindir` at the
+front of PATH.
+
+Jobs are not executed; their life cycle is simulated from the submit
+time, the dependencies and the settings below (environment variables):
+
+  FAKE_SCHED_DIR         directory holding the job records (required)
+  FAKE_SCHED_LATENCY     seconds added to every command, default 0
+  FAKE_SCHED_QUEUE_WAIT  seconds a job stays pending, default 0
+  FAKE_SCHED_DURATION    run time in seconds, "t" or "tmin:tmax", default 1
+  FAKE_SCHED_FAIL_RATE   fraction of jobs (or array tasks) that fail, default 0
+  FAKE_SCHED_FAIL_STATE  SLURM state of failed jobs, default FAILED
+  FAKE_SCHED_FAIL_MATCH  jobs whose batch script contains this text fail
+  FAKE_SCHED_MEMORY_NEED memory needed by every job (e.g., "4GB"); jobs
+                         requesting less end as OUT_OF_MEMORY
+  FAKE_SCHED_MAXRSS      peak memory reported by sacct, default 1024K
+  FAKE_SCHED_MIN_JOB_AGE seconds a finished job stays visible to
+                         squeue/scontrol/qstat (without -x), default 300
+
+Every invocation is appended to FAKE_SCHED_DIR/calls.log so the number
+of scheduler calls made by a driver can be counted.
+'''
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import random
+import fcntl
+
+TOOLS = ['sbatch','squeue','scontrol','scancel','sacct',
+         'qsub','qstat','qdel','qalter']
+
+PBS_SERVER = 'fakepbs'
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def install(bindir):
+    '''create links named after the scheduler commands in bindir'''
+    if not os.path.exists(bindir):
+        os.makedirs(bindir)
+
+    script = os.path.abspath(__file__)
+    st = os.stat(script)
+    os.chmod(script, st.st_mode | 0o111)
+    for tool in TOOLS:
+        link = os.path.join(bindir,tool)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(script,link)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _env_float(name,default):
+    return float(os.environ.get(name,default))
+
+def _state_dir():
+    return os.environ['FAKE_SCHED_DIR']
+
+def _job_file(jid):
+    return os.path.join(_state_dir(),'job.%s.json'%jid)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _next_jid():
+    '''return a new job ID, serialized through a lock file'''
+    counter = os.path.join(_state_dir(),'counter')
+    with open(counter,'a+') as fid:
+        fcntl.flock(fid,fcntl.LOCK_EX)
+        fid.seek(0)
+        n = int(fid.read() or 1000) + 1
+        fid.seek(0)
+        fid.truncate()
+        fid.write('%d'%n)
+    return str(n)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _load(jid):
+    '''return the job record for a job ID or None'''
+    base = jid.split('.')[0].split('_')[0].replace('[]','')
+    try:
+        with open(_job_file(base)) as fid:
+            return json.load(fid)
+    except (IOError,OSError,ValueError):
+        return None
+
+def _save(job):
+    tmpfile = _job_file(job['jid'])+'.tmp'
+    with open(tmpfile,'w') as fid:
+        json.dump(job,fid)
+    os.rename(tmpfile,_job_file(job['jid']))
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _parse_seconds(time_limit):
+    days = 0
+    if '-' in time_limit:
+        days,time_limit = time_limit.split('-',1)
+        days = int(days)
+    fields = [int(f) for f in time_limit.split(':')]
+    if len(fields) == 1:
+        seconds = fields[0]*60
+    elif len(fields) == 2:
+        seconds = fields[0]*60 + fields[1]
+    else:
+        seconds = fields[0]*3600 + fields[1]*60 + fields[2]
+    return days*86400 + seconds
+
+def _parse_bytes(memory):
+    memory = memory.upper().rstrip('B')
+    units = {'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+    if memory and memory[-1] in units:
+        return int(float(memory[:-1])*units[memory[-1]])
+    return int(float(memory))
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _submit(script,pbs=False):
+    '''create a job record from the directives in a batch script'''
+
+    job = {'name': os.path.basename(script),
+           'script': script,
+           'submit_time': time.time(),
+           'depend': [],
+           'ntask': 1,
+           'array': False,
+           'time_limit': None,
+           'memory': None,
+           'oom': False,
+           'cancel_time': None,
+           'pbs': pbs}
+
+    with open(script) as fid:
+        text = fid.read()
+        for line in text.splitlines():
+            items = line.split()
+            if not items or items[0] not in ['#SBATCH','#PBS']:
+                continue
+            opt = items[1]
+            val = items[2] if len(items) > 2 else ''
+            if opt.startswith('--array=') or (opt == '-J' and pbs):
+                rng = opt.split('=',1)[1] if '=' in opt else val
+                job['ntask'] = int(rng.split('%')[0].split('-')[1]) + 1
+                job['array'] = True
+            elif opt in ['-J','-N']:
+                job['name'] = val
+            elif opt == '-d' or opt.startswith('--dependency='):
+                dep = opt.split('=',1)[1] if '=' in opt else val
+                job['depend'] = dep.split(':')[1:]
+            elif opt == '-W' and val.startswith('depend='):
+                job['depend'] = val.split('=',1)[1].split(':')[1:]
+            elif opt == '-t':
+                job['time_limit'] = _parse_seconds(val)
+            elif opt == '-l' and val.startswith('walltime='):
+                job['time_limit'] = _parse_seconds(val.split('=',1)[1])
+            elif opt.startswith('--mem='):
+                job['memory'] = _parse_bytes(opt.split('=',1)[1])
+            elif opt == '-l' and ':mem=' in val:
+                job['memory'] = _parse_bytes(val.split(':mem=',1)[1].split(':')[0])
+
+    #-- draw durations and outcomes for each task
+    duration = os.environ.get('FAKE_SCHED_DURATION','1').split(':')
+    fail_rate = _env_float('FAKE_SCHED_FAIL_RATE',0.)
+    job['duration'] = []
+    job['fail'] = []
+    for i in range(job['ntask']):
+        if len(duration) == 1:
+            job['duration'].append(float(duration[0]))
+        else:
+            job['duration'].append(random.uniform(float(duration[0]),
+                                                  float(duration[1])))
+        job['fail'].append(random.random() < fail_rate)
+
+    fail_match = os.environ.get('FAKE_SCHED_FAIL_MATCH')
+    if fail_match and fail_match in text:
+        job['fail'] = [True]*job['ntask']
+
+    memory_need = os.environ.get('FAKE_SCHED_MEMORY_NEED')
+    if memory_need and job['memory'] is not None:
+        job['oom'] = job['memory'] < _parse_bytes(memory_need)
+
+    job['jid'] = _next_jid()
+    _save(job)
+    return job['jid']
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _task_states(job,now,cache=None):
+    '''
+    return a list of (state,start,end) for the tasks of a job;
+    end is None while the end time is not yet determined
+    '''
+    if cache is None:
+        cache = {}
+    if job['jid'] in cache:
+        return cache[job['jid']]
+
+    fail_state = os.environ.get('FAKE_SCHED_FAIL_STATE','FAILED')
+    queue_wait = _env_float('FAKE_SCHED_QUEUE_WAIT',0.)
+
+    #-- earliest start given dependencies
+    start = job['submit_time'] + queue_wait
+    held = False
+    for dep in job['depend']:
+        dep_job = _load(dep)
+        if dep_job is None:
+            continue
+        dep_tasks = _task_states(dep_job,now,cache)
+        if any(s != 'COMPLETED' for s,t0,t1 in dep_tasks):
+            held = True
+        else:
+            start = max([start]+[t1 for s,t0,t1 in dep_tasks])
+
+    tasks = []
+    for i in range(job['ntask']):
+        cancel = job['cancel_time']
+        if held or now < start:
+            if cancel is not None:
+                tasks.append(('CANCELLED',cancel,cancel))
+            else:
+                tasks.append(('PENDING',None,None))
+            continue
+
+        duration = job['duration'][i]
+        final = fail_state if job['fail'][i] else 'COMPLETED'
+        if job.get('oom'):
+            final = 'OUT_OF_MEMORY'
+        if job['time_limit'] is not None and duration > job['time_limit']:
+            duration = job['time_limit']
+            final = 'TIMEOUT'
+        end = start + duration
+
+        if cancel is not None and cancel < end:
+            tasks.append(('CANCELLED',start,max(cancel,start)))
+        elif now < end:
+            tasks.append(('RUNNING',start,None))
+        else:
+            tasks.append((final,start,end))
+
+    cache[job['jid']] = tasks
+    return tasks
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def job_end_times(state_dir=None):
+    '''return a dictionary of end times of finished jobs (or None)'''
+    if state_dir is not None:
+        os.environ['FAKE_SCHED_DIR'] = state_dir
+    now = time.time()
+    end_times = {}
+    cache = {}
+    for f in os.listdir(_state_dir()):
+        if not (f.startswith('job.') and f.endswith('.json')):
+            continue
+        job = _load(f[4:-5])
+        tasks = _task_states(job,now,cache)
+        if any(t1 is None for s,t0,t1 in tasks):
+            end_times[job['jid']] = None
+        else:
+            end_times[job['jid']] = max(t1 for s,t0,t1 in tasks)
+    return end_times
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def write_records(session_dir,state_dir=None):
+    '''
+    write the completion records that the batch scripts of finished jobs
+    would have written; jobs killed by the scheduler write none
+    '''
+    if state_dir is not None:
+        os.environ['FAKE_SCHED_DIR'] = state_dir
+    now = time.time()
+    cache = {}
+    written = set(os.listdir(session_dir))
+    for f in os.listdir(_state_dir()):
+        if not (f.startswith('job.') and f.endswith('.json')):
+            continue
+        job = _load(f[4:-5])
+        name = os.path.basename(job['script'])
+        for i,(state,t0,t1) in enumerate(_task_states(job,now,cache)):
+            record = name+('.%d'%i if job['array'] else '')+'.done'
+            if record in written or t1 is None:
+                continue
+            if state not in ['COMPLETED','FAILED']:
+                continue
+            with open(os.path.join(session_dir,record),'w') as fid:
+                fid.write('exit_code=%d\n'%(0 if state == 'COMPLETED' else 1))
+                fid.write('start=%d\nend=%d\n'%(t0,t1))
+                fid.write('host=fake\nmaxrss=\n')
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _visible(tasks,now):
+    '''finished jobs drop out of the live queue after MIN_JOB_AGE'''
+    min_job_age = _env_float('FAKE_SCHED_MIN_JOB_AGE',300.)
+    ends = [t1 for s,t0,t1 in tasks]
+    if None in ends:
+        return True
+    return now - max(ends) < min_job_age
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _task_ids(job,tasks):
+    if job['array']:
+        return ['%s_%d'%(job['jid'],i) for i in range(len(tasks))]
+    else:
+        return [job['jid']]
+
+def _jid_args(args):
+    jids = []
+    for a in args:
+        jids.extend(j for j in a.split(',') if j)
+    return jids
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def sbatch(args):
+    jid = _submit(args[-1])
+    print('Submitted batch job %s'%jid)
+
+def qsub(args):
+    jid = _submit(args[-1],pbs=True)
+    job = _load(jid)
+    if job['array']:
+        print('%s[].%s'%(jid,PBS_SERVER))
+    else:
+        print('%s.%s'%(jid,PBS_SERVER))
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def squeue(args):
+    fmt = '%i %T'
+    jids = None
+    header = True
+    for a in args:
+        if a.startswith('--format='):
+            fmt = a.split('=',1)[1]
+        elif a.startswith('--jobs='):
+            jids = _jid_args([a.split('=',1)[1]])
+        elif a in ['--noheader','-h']:
+            header = False
+
+    if jids is None:
+        jids = [f[4:-5] for f in os.listdir(_state_dir())
+                if f.startswith('job.') and f.endswith('.json')]
+
+    now = time.time()
+    cache = {}
+    lines = []
+    for jid in jids:
+        job = _load(jid)
+        if job is None or job['pbs']:
+            continue
+        tasks = _task_states(job,now,cache)
+        if not _visible(tasks,now):
+            continue
+        for tid,(state,t0,t1) in zip(_task_ids(job,tasks),tasks):
+            if '_' in jid and tid != jid:
+                continue
+            fields = {'i': tid,
+                      'F': job['jid'],
+                      'A': tid,
+                      'T': state,
+                      'j': job['name'],
+                      'E': ','.join('afterok:'+d for d in job['depend']) or '(null)'}
+            tokens = fmt.split('%')
+            lines.append(tokens[0]+''.join(fields.get(tok[:1],'')+tok[1:]
+                                           for tok in tokens[1:]))
+
+    if header:
+        print('JOBID STATE')
+    for line in lines:
+        print(line)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def scontrol(args):
+    if args[:2] == ['show','job']:
+        job = _load(args[2])
+        now = time.time()
+        tasks = _task_states(job,now) if job is not None else None
+        if job is None or job['pbs'] or not _visible(tasks,now):
+            sys.stderr.write('slurm_load_jobs error: Invalid job id specified\n')
+            sys.exit(1)
+        dep = ','.join('afterok:%s(unfulfilled)'%d for d in job['depend'])
+        for tid,(state,t0,t1) in zip(_task_ids(job,tasks),tasks):
+            print('JobId=%s JobName=%s'%(tid,job['name']))
+            print('   JobState=%s Reason=None Dependency=%s'%(state,dep or '(null)'))
+            print('   Command=%s'%job['script'])
+            print()
+
+    elif args[:1] == ['update']:
+        opts = dict(a.split('=',1) for a in args[1:])
+        opts = dict((k.lower(),v) for k,v in opts.items())
+        job = _load(opts['jobid'])
+        if 'dependency' in opts:
+            job['depend'] = opts['dependency'].split(':')[1:]
+        _save(job)
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _cancel(args):
+    for jid in _jid_args(args):
+        job = _load(jid)
+        if job is not None and job['cancel_time'] is None:
+            job['cancel_time'] = time.time()
+            _save(job)
+
+def scancel(args):
+    _cancel(args)
+
+def qdel(args):
+    _cancel([a for a in args if not a.startswith('-')])
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def sacct(args):
+    fmt = ['JobID','State']
+    jids = []
+    allocations = False
+    for a in args:
+        if a.startswith('--format='):
+            fmt = a.split('=',1)[1].split(',')
+        elif a.startswith('--jobs='):
+            jids = _jid_args([a.split('=',1)[1]])
+        elif a in ['--allocations','-X']:
+            allocations = True
+
+    maxrss = os.environ.get('FAKE_SCHED_MAXRSS','1024K')
+    now = time.time()
+    cache = {}
+    for jid in jids:
+        job = _load(jid)
+        if job is None or job['pbs']:
+            continue
+        tasks = _task_states(job,now,cache)
+        for tid,(state,t0,t1) in zip(_task_ids(job,tasks),tasks):
+            elapsed = 0
+            if t0 is not None:
+                elapsed = int((t1 if t1 is not None else now) - t0)
+            rows = [(tid,state,'')]
+            if not allocations and t0 is not None:
+                rows.append((tid+'.batch',state,maxrss))
+            for row_id,row_state,row_rss in rows:
+                fields = {'JobID': row_id,
+                          'State': row_state,
+                          'MaxRSS': row_rss,
+                          'ElapsedRaw': '%d'%elapsed,
+                          'ExitCode': '0:0' if row_state == 'COMPLETED' else '1:0'}
+                print('|'.join(fields.get(f,'') for f in fmt))
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _unmet_depend(job,now,cache):
+    '''return True if any dependency of a job has not completed'''
+    for dep in job['depend']:
+        dep_job = _load(dep)
+        if dep_job is not None and any(s != 'COMPLETED' for s,t0,t1
+                                       in _task_states(dep_job,now,cache)):
+            return True
+    return False
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def qstat(args):
+    history = any(a.startswith('-') and 'x' in a for a in args)
+    jids = [a for a in args if not a.startswith('-')]
+    now = time.time()
+    cache = {}
+    for jid in jids:
+        job = _load(jid)
+        tasks = _task_states(job,now,cache) if job is not None else None
+        if job is None or not job['pbs'] or not (history or _visible(tasks,now)):
+            sys.stderr.write('qstat: Unknown Job Id %s\n'%jid)
+            continue
+
+        states = [s for s,t0,t1 in tasks]
+        if 'RUNNING' in states:
+            state = 'B' if job['array'] else 'R'
+        elif 'PENDING' in states and _unmet_depend(job,now,cache):
+            state = 'H'
+        elif 'PENDING' in states:
+            state = 'Q'
+        else:
+            state = 'F'
+
+        print('Job Id: %s'%jid)
+        print('    Job_Name = %s'%job['name'])
+        print('    job_state = %s'%state)
+        if state == 'F' and not job['array']:
+            print('    Exit_status = %d'%(0 if states[0] == 'COMPLETED' else 1))
+        print()
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def qalter(args):
+    depend = None
+    for i,a in enumerate(args):
+        if a == '-W' and args[i+1].startswith('depend='):
+            depend = args[i+1].split('=',1)[1].split(':')[1:]
+    job = _load(args[-1])
+    if job is not None and depend is not None:
+        job['depend'] = depend
+        _save(job)
+
+#------------------------------------------------------------
+#-- main
+#------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    tool = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+
+    if tool == 'fake_scheduler.py':
+        install(args[0])
+        sys.exit(0)
+
+    t0 = time.time()
+    time.sleep(_env_float('FAKE_SCHED_LATENCY',0.))
+    globals()[tool](args)
+
+    with open(os.path.join(_state_dir(),'calls.log'),'a') as fid:
+        fid.write('%s %.6f %.6f\n'%(tool,t0,time.time()-t0))
@@ -0,0 +1,94 @@
+import os
+import sys
+import collections
+
+import numpy as np
+import pytest
+
+from workflow import argpass
+
+Pair = collections.namedtuple('Pair',['a','b'])
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _parse(monkeypatch,*args):
+    '''run pickleparse on a command line'''
+    monkeypatch.setattr(sys,'argv',['script.py']+list(args))
+    return argpass.pickleparse(default={'x': None})
+
+#------------------------------------------------------------
+#-- fixture
+#------------------------------------------------------------
+
+@pytest.fixture(autouse=True)
+def tmpdir(tmp_path,monkeypatch):
+    monkeypatch.setattr(argpass,'tmpdir',str(tmp_path)+'/')
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_inline(monkeypatch):
+    kwargs = {'x': 1, 'files': ['a.nc','b.nc'], 'pair': Pair(1,'b')}
+    arg = argpass.picklepass(kwargs)
+    assert arg.startswith(argpass.INLINE_PREFIX)
+    assert _parse(monkeypatch,arg) == kwargs
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_file(monkeypatch):
+    #-- too large to pass inline, even compressed
+    kwargs = {'x': os.urandom(argpass.INLINE_MAX)}
+    path = argpass.picklepass(kwargs)
+    assert os.path.isfile(path)
+    assert _parse(monkeypatch,path) == kwargs
+
+    kwargs = {'x': 1}
+    path = argpass.picklepass(kwargs,asfile=True)
+    assert _parse(monkeypatch,'-f',path) == kwargs
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_list_index(monkeypatch):
+    arg = argpass.picklepass([{'x': 0},{'x': 1}])
+    assert _parse(monkeypatch,'-i','1',arg) == {'x': 1}
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_manifest(monkeypatch):
+    shared = {'x': 0, 'script': 'calc.py'}
+    deltas = [{'x': i, 'i0': 10*i} for i in range(5)]
+    path = argpass.picklepass_manifest(shared,deltas)
+    for i in range(5):
+        expected = dict(shared,**deltas[i])
+        assert argpass.read_manifest(path,i) == expected
+        assert _parse(monkeypatch,'-f',path,'-i',str(i)) == expected
+
+    with pytest.raises(ValueError):
+        _parse(monkeypatch,path)
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_spilled_arrays(monkeypatch):
+    n = argpass.SPILL_MIN//8 + 1
+    data = np.arange(n,dtype='f8')
+    kwargs = {'x': Pair(data,[data,3]), 'small': np.arange(3)}
+    arg = argpass.picklepass(kwargs)
+    assert len(arg) < argpass.INLINE_MAX
+
+    control = _parse(monkeypatch,arg)
+    assert isinstance(control['x'],Pair)
+    np.testing.assert_array_equal(control['x'].a,data)
+    np.testing.assert_array_equal(control['x'].b[0],data)
+    assert control['x'].b[1] == 3
+    np.testing.assert_array_equal(control['small'],np.arange(3))
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+cftime = pytest.importorskip('cftime')
+netCDF4 = pytest.importorskip('netCDF4')
+
+from workflow import chunktime
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _monthly(year0,nyear,calendar='noleap'):
+    '''mid-month dates'''
+    return np.array([cftime.datetime(y,m,15,calendar=calendar)
+                     for y in range(year0,year0+nyear) for m in range(1,13)])
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_gen_time_chunks():
+    assert chunktime.gen_time_chunks(0,10,4) == [(0,4),(4,8),(8,10)]
+    assert chunktime.gen_time_chunks(2,10,4) == [(2,6),(6,10)]
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_gen_calendar_chunks():
+    time = _monthly(1850,3)
+
+    time_ndx,labels = chunktime.gen_calendar_chunks(time,'year')
+    assert time_ndx == [(0,12),(12,24),(24,36)]
+    assert labels == ['1850','1851','1852']
+
+    time_ndx,labels = chunktime.gen_calendar_chunks(time[:30],'2year',start=6)
+    assert time_ndx == [(6,30),(30,36)]
+    assert labels == ['1850-1851','1852-1852']
+
+    time_ndx,labels = chunktime.gen_calendar_chunks(time[:5],'month')
+    assert time_ndx == [(i,i+1) for i in range(5)]
+    assert labels[0] == '1850-01'
+
+    time_ndx,labels = chunktime.gen_calendar_chunks(time[1:8],'3month')
+    assert time_ndx == [(0,3),(3,6),(6,7)]
+    assert labels == ['1850-02_1850-04','1850-05_1850-07','1850-08_1850-08']
+
+    time_ndx,labels = chunktime.gen_calendar_chunks(
+        np.array(['2000-01-31','2000-02-29','2001-01-31'],dtype='M8[D]'),'year')
+    assert time_ndx == [(0,2),(2,3)]
+    assert labels == ['2000','2001']
+
+    with pytest.raises(ValueError):
+        chunktime.gen_calendar_chunks(time,'week')
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_chunk_files(tmp_path):
+    files = []
+    for i,ntime in enumerate([12,12,6]):
+        path = str(tmp_path/('in%d.nc'%i))
+        with netCDF4.Dataset(path,'w',format='NETCDF3_64BIT_OFFSET') as nc:
+            nc.createDimension('time',None)
+            nc.createVariable('time','f8',('time',))[:] = range(ntime)
+        files.append(path)
+
+    offsets = chunktime.time_index(files)
+    assert list(offsets) == [0,12,24,30]
+
+    #-- chunks within a file, across files and ending at a file boundary
+    chunks = chunktime.chunk_files(offsets,[(0,10),(10,20),(20,24),(24,30)])
+    assert chunks == [(0,1,0,10),(0,2,10,20),(1,2,8,12),(2,3,0,6)]
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_read_time(tmp_path):
+    files = []
+    for i in range(2):
+        path = str(tmp_path/('in%d.nc'%i))
+        with netCDF4.Dataset(path,'w') as nc:
+            nc.createDimension('time',None)
+            t = nc.createVariable('time','f8',('time',))
+            t.units = 'days since %04d-01-01'%(1850+i)
+            t.calendar = 'noleap' if i == 0 else '365_day'
+            t[:] = [15.,45.]
+        files.append(path)
+
+    time = chunktime.read_time(files)
+    assert [(t.year,t.month) for t in time] == [(1850,1),(1850,2),(1851,1),(1851,2)]
+
+    with netCDF4.Dataset(files[1],'a') as nc:
+        nc.variables['time'].calendar = 'gregorian'
+    with pytest.raises(ValueError):
+        chunktime.read_time(files)
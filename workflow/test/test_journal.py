@@ -0,0 +1,46 @@
+from workflow import journal
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_task_key():
+    key = journal.task_key(['calc.py','-i','1'],{'account': 'A', 'array': 4})
+
+    #-- independent of argument order, memory, time limit and dependencies
+    assert key == journal.task_key(['calc.py','-i','1'],
+                                   {'array': 4, 'account': 'A',
+                                    'memory': '8GB', 'time_limit': '01:00:00',
+                                    'depjob': ['1001']})
+    assert key != journal.task_key(['calc.py','-i','2'],{'account': 'A', 'array': 4})
+    assert key != journal.task_key(['calc.py','-i','1'],{'account': 'A', 'array': 5})
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_journal(tmp_path):
+    path = str(tmp_path/'journal.sqlite')
+    jnl = journal.Journal(path)
+    jnl.add('k1','1001',['a'],{},'PENDING',depjob='1000')
+    jnl.add('k2','1002',['b'],{},'PENDING',record='b.run',ntask=4)
+    jnl.close()
+
+    #-- entries outlive the connection
+    jnl = journal.Journal(path)
+    assert jnl.lookup('k0') is None
+    entry = jnl.lookup('k2')
+    assert (entry['jid'],entry['record'],entry['ntask']) == ('1002','b.run',4)
+    assert entry['depjob'] == '[]'
+    assert jnl.lookup('k1')['depjob'] == '["1000"]'
+
+    jnl.update({'k1': 'DONE', 'k2': 'RUN'},['DONE','FAILED'])
+    assert [e['key'] for e in jnl.active(['PENDING','RUN'])] == ['k2']
+    assert jnl.lookup('k1')['end_time'] is not None
+    assert jnl.lookup('k2')['end_time'] is None
+
+    #-- a resubmission replaces the entry of the task
+    jnl.add('k1','2001',['a'],{},'PENDING')
+    assert jnl.lookup('k1')['jid'] == '2001'
+    assert len(jnl.active(['PENDING','RUN'])) == 2
+    jnl.close()
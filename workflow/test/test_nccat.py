@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+from workflow import nccat
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _write(path,year,raw):
+    '''one file of packed data with its own time units'''
+    with netCDF4.Dataset(path,'w') as nc:
+        nc.createDimension('time',None)
+        nc.createDimension('x',2)
+        nc.createDimension('d2',2)
+        t = nc.createVariable('time','f8',('time',))
+        t.units = 'days since %04d-01-01'%year
+        t.calendar = 'noleap'
+        t.bounds = 'time_bnds'
+        b = nc.createVariable('time_bnds','f8',('time','d2'))
+        v = nc.createVariable('v','i2',('time','x'),fill_value=-999)
+        v.scale_factor = 0.5
+        v.add_offset = 1.
+        v.set_auto_maskandscale(False)
+        t[:] = [15.,45.]
+        b[:] = [[0.,30.],[30.,60.]]
+        v[:] = raw
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_concat_packed_and_time(tmp_path):
+    raw = [np.array([[2,4],[6,-999]],dtype='i2'),
+           np.array([[8,-999],[10,12]],dtype='i2')]
+    files = [str(tmp_path/('in%d.nc'%i)) for i in range(2)]
+    for i,path in enumerate(files):
+        _write(path,2000+i,raw[i])
+
+    output = str(tmp_path/'out.nc')
+    nccat.concat(files,output,buffer='8')
+
+    with netCDF4.Dataset(output) as nc:
+        nc.set_auto_maskandscale(False)
+        #-- packed values and fill values are copied unchanged
+        np.testing.assert_array_equal(nc.variables['v'][:],np.concatenate(raw))
+        assert nc.variables['v'].getncattr('_FillValue') == -999
+
+        #-- time and bounds in the units of the first file
+        assert nc.variables['time'].units == 'days since 2000-01-01'
+        np.testing.assert_array_equal(nc.variables['time'][:],[15.,45.,380.,410.])
+        np.testing.assert_array_equal(nc.variables['time_bnds'][2],[365.,395.])
+
+    assert not (tmp_path/'out.nc.tmp').exists()
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_concat_failure_leaves_no_output(tmp_path):
+    path = str(tmp_path/'in0.nc')
+    _write(path,2000,np.zeros((2,2),dtype='i2'))
+    output = str(tmp_path/'out.nc')
+
+    with pytest.raises(Exception):
+        nccat.concat([path,str(tmp_path/'missing.nc')],output)
+    assert not (tmp_path/'out.nc').exists()
+    assert not (tmp_path/'out.nc.tmp').exists()
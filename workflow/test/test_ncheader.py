@@ -0,0 +1,62 @@
+import pytest
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+from workflow import ncheader
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _write(path,fmt,ntime=3):
+    '''a file with record and fixed variables of several types'''
+    with netCDF4.Dataset(path,'w',format=fmt) as nc:
+        nc.title = 'test file'
+        nc.createDimension('time',None)
+        nc.createDimension('lat',4)
+        nc.createDimension('lon',5)
+        nc.createDimension('nchar',8)
+        t = nc.createVariable('time','f8',('time',))
+        t.units = 'days since 0001-01-01'
+        t[:] = range(ntime)
+        v = nc.createVariable('temp','f4',('time','lat','lon'))
+        v.long_name = 'temperature'
+        v[:] = 0.
+        nc.createVariable('mask','i1',('lat','lon'))
+        nc.createVariable('count','i2',('time','lat'))
+        nc.createVariable('name','S1',('time','nchar'))
+        nc.createVariable('area','f8',('lat','lon'))
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+@pytest.mark.parametrize('fmt',['NETCDF3_CLASSIC','NETCDF3_64BIT_OFFSET',
+                                'NETCDF3_64BIT_DATA','NETCDF4'])
+def test_header(tmp_path,fmt):
+    path = str(tmp_path/'file.nc')
+    _write(path,fmt)
+
+    with open(path,'rb') as fid:
+        classic = ncheader._read_classic(fid) is not None
+    assert classic == fmt.startswith('NETCDF3')
+
+    assert ncheader.dimensions(path) == {'time': 3, 'lat': 4, 'lon': 5, 'nchar': 8}
+    assert ncheader.time_length(path) == 3
+    assert ncheader.record_bytes(path) == 8 + 4*20 + 2*4 + 8
+    assert ncheader.header(path)['variables']['temp'] == (('time','lat','lon'),4)
+
+    with pytest.raises(ValueError):
+        ncheader.time_length(path,dim='level')
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_cache_follows_changes(tmp_path):
+    path = str(tmp_path/'file.nc')
+    _write(path,'NETCDF3_CLASSIC',ntime=3)
+    assert ncheader.time_length(path) == 3
+
+    _write(path,'NETCDF3_CLASSIC',ntime=7)
+    assert ncheader.time_length(path) == 7
@@ -0,0 +1,156 @@
+import os
+import time
+import importlib
+import threading
+
+import pytest
+
+import fake_scheduler
+
+#------------------------------------------------------------
+#-- function
+#------------------------------------------------------------
+
+def _calls(state_dir,tool):
+    '''number of times a scheduler command was run'''
+    with open(os.path.join(state_dir,'calls.log')) as fid:
+        return len([l for l in fid if l.split()[0] == tool])
+
+def _restart(tm):
+    '''reload task_manager as a new driver run would'''
+    importlib.reload(tm)
+    tm.QUEUE_MAX_HOURS = 1e6
+    tm.SENTINEL = False
+    tm.USAGE = False
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_wait_on_dependent_jobs(tm):
+    jid = [tm.submit(['echo','%d'%i]) for i in range(3)]
+    jid.append(tm.submit(['ls'],depjob=jid))
+    assert tm.wait(closeout=True,poll=0.1)
+    assert not tm.JID
+    assert tm.status_list(jid) == dict((j,'DONE') for j in jid)
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_wait_on_held_pbs_jobs(tm,monkeypatch):
+    monkeypatch.setenv('FAKE_SCHED_DURATION','1')
+    tm.Q_SYSTEM = 'PBS'
+    a = tm.submit(['echo','a'])
+    b = tm.submit(['echo','b'],depjob=a)
+    assert tm.status(b) == 'PENDING'
+    assert tm.wait(closeout=True,poll=0.1)
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_failure_cancels_dependents(tm,fake_sched,monkeypatch):
+    monkeypatch.setenv('FAKE_SCHED_FAIL_MATCH','FAILME')
+    a = tm.submit(['echo','FAILME'])
+    b = tm.submit(['echo','b'],depjob=a)
+    c = tm.submit(['echo','c'],depjob=b)
+    d = tm.submit(['echo','d'])
+
+    assert not tm.wait(closeout=True,poll=0.1)
+    for jid in [b,c]:
+        assert fake_scheduler._load(jid)['cancel_time'] is not None
+    assert fake_scheduler._load(d)['cancel_time'] is None
+    assert tm.status(d) == 'DONE'
+    assert _calls(fake_sched,'scancel') == 1
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_retry_moves_dependents(tm,monkeypatch):
+    monkeypatch.setenv('FAKE_SCHED_MEMORY_NEED','4GB')
+    tm.RETRY = tm.RetryPolicy(backoff=0.1)
+    a = tm.submit(['echo','a'],memory='2GB')
+    b = tm.submit(['echo','b'],depjob=a,memory='8GB')
+
+    assert tm.wait(closeout=True,poll=0.1)
+    a2 = tm._retry_map[a]
+    assert a2 != a
+    assert tm._retry_latest(a) == a2
+
+    assert fake_scheduler._load(a2)['memory'] == 4*2**30
+    assert fake_scheduler._load(b)['depend'] == [a2]
+    assert tm.status(b) == 'DONE'
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_retry_gives_up(tm,monkeypatch):
+    monkeypatch.setenv('FAKE_SCHED_FAIL_MATCH','FAILME')
+    tm.RETRY = tm.RetryPolicy(backoff=0.1)
+    a = tm.submit(['echo','FAILME'])
+
+    #-- a plain failure is not among the reasons retried by default
+    assert not tm.wait(closeout=True,poll=0.1)
+    assert a not in tm._retry_map
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_completion_records(tm,fake_sched):
+    tm.SENTINEL = True
+    jid = [tm.submit(['echo','%d'%i]) for i in range(3)]
+
+    done = threading.Event()
+    def _records():
+        while not done.wait(0.05):
+            fake_scheduler.write_records(tm._session_dir())
+    thread = threading.Thread(target=_records)
+    thread.start()
+    try:
+        t0 = time.time()
+        assert tm.wait(closeout=True,poll=0.1)
+    finally:
+        done.set()
+        thread.join()
+
+    #-- completion found from the records, not from repeated queries
+    assert time.time() - t0 < tm.SENTINEL_QUERY_INTERVAL
+    assert _calls(fake_sched,'squeue') + _calls(fake_sched,'sacct') <= 2
+    for j in jid:
+        records = tm.job_records(j)
+        assert len(records) == 1
+        assert records[0]['exit_code'] == 0
+
+#------------------------------------------------------------
+#-- test
+#------------------------------------------------------------
+
+def test_journal_restart(tm,tmp_path,monkeypatch):
+    monkeypatch.setenv('FAKE_SCHED_FAIL_MATCH','FAILME')
+    path = str(tmp_path/'journal.sqlite')
+    tm.open_journal(path)
+    a = tm.submit(['echo','FAILME'])
+    b = tm.submit(['echo','b'])
+    assert not tm.wait(closeout=True,poll=0.1)
+    tm.JOURNAL.close()
+
+    #-- a restarted driver skips the completed task and reruns the failed one
+    monkeypatch.setenv('FAKE_SCHED_DURATION','60')
+    _restart(tm)
+    tm.open_journal(path)
+    assert tm.submit(['echo','b']) == b
+    assert tm.submit(['echo','FAILME']) not in [a,b]
+
+    #-- memory and dependencies are not part of the task key
+    d = tm.submit(['echo','d'])
+    tm.JOURNAL.close()
+    _restart(tm)
+    tm.open_journal(path)
+    assert tm.submit(['echo','d'],memory='8GB',depjob=b) == d
+    assert d in tm.JID
+    tm.kill(list(tm.JID))
+    tm.JOURNAL.close()
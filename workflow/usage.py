@@ -0,0 +1,57 @@
+import time
+import sqlite3
+
+#------------------------------------------------------------
+#-- class
+#------------------------------------------------------------
+
+class UsageHistory(object):
+    '''on-disk history of the peak memory and run time of finished jobs,
+    by task class (see task_manager._usage_class)
+
+    Parameters
+    ----------
+
+    path : str
+      SQLite database file; created if it does not exist
+    '''
+
+    def __init__(self,path):
+        self.path = path
+        self.conn = sqlite3.connect(path,timeout=60.)
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS usage (
+                                   task_class TEXT,
+                                   jid TEXT,
+                                   maxrss INTEGER,
+                                   elapsed INTEGER,
+                                   end_time REAL)''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS usage_class ON usage (task_class)')
+
+    def add(self,rows):
+        '''record a list of (task_class, jid, maxrss, elapsed) in one
+        transaction; maxrss in bytes, elapsed in seconds'''
+        if not rows:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany('INSERT INTO usage VALUES (?,?,?,?,?)',
+                                  [row+(now,) for row in rows])
+
+    def percentile(self,task_class,column,q,min_samples=1,recent=100):
+        '''return the q-th percentile of a column ("maxrss" or "elapsed")
+        over the most recent jobs of a task class, or None if there are
+        fewer than min_samples'''
+        if column not in ['maxrss','elapsed']:
+            raise ValueError('Unknown usage column: %s'%column)
+        values = [row[0] for row in self.conn.execute(
+            'SELECT %s FROM usage WHERE task_class = ? AND %s IS NOT NULL '
+            'ORDER BY end_time DESC LIMIT ?'%(column,column),
+            (task_class,recent))]
+        if len(values) < max(min_samples,1):
+            return None
+        values.sort()
+        return values[min(int(round(q/100.*(len(values)-1))),len(values)-1)]
+
+    def close(self):
+        self.conn.close()